@@ -0,0 +1,275 @@
+import re
+import time
+import argparse
+from typing import Dict, List, Callable
+
+from twitter.api.parser import Parser
+from twitter.api.grammar import GRAMMAR, EMOJIS
+from benchmarks.synthetic import tweet_texts
+
+
+class LegacyParser(object):
+    """
+    Per-line classifiers as they were before the compiled line grammar, kept as the benchmark baseline
+    """
+    @staticmethod
+    def remove_emojis(text: str) -> str:
+        emoj = re.compile("["
+                          u"\U0001F600-\U0001F64F"  # emoticons
+                          u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+                          u"\U0001F680-\U0001F6FF"  # transport & map symbols
+                          u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+                          u"\U00002500-\U00002BEF"  # chinese char
+                          u"\U00002702-\U000027B0"
+                          u"\U00002702-\U000027B0"
+                          u"\U000024C2-\U0001F251"
+                          u"\U0001f926-\U0001f937"
+                          u"\U00010000-\U0010ffff"
+                          u"\u2640-\u2642"
+                          u"\u2600-\u2B55"
+                          u"\u200d"
+                          u"\u23cf"
+                          u"\u23e9"
+                          u"\u231a"
+                          u"\ufe0f"  # dingbats
+                          u"\u3030"
+                          "]+", re.UNICODE)
+        return re.sub(emoj, '', text).strip()
+
+    @staticmethod
+    def _is_airport_format(version: str, tweet_line: str) -> bool:
+        if version == 'v1':
+            tweet_line_parts = [t.strip() for t in tweet_line.split('-')]
+            # Should have two parts
+            split_by_dash = len(tweet_line_parts) == 2
+            if not split_by_dash:
+                return split_by_dash
+
+            # First part is airport code
+            airport_code = tweet_line_parts[0]
+            is_airport_code = bool(re.match('[A-Z]{3}', airport_code))
+            # Second part is a time
+            is_time = re.match(r'^[0-9]{1,2}:[0-9]{2}\s?[ap]m [A-Z0-9+]{2,3}', tweet_line_parts[1])
+            return is_airport_code and is_time
+        else:
+            return False
+
+    @staticmethod
+    def _airport_format(version: str, ldx: int, tweet_line: str) -> Dict[str, str]:
+        if version == 'v1':
+            tweet_line_parts = [t.strip() for t in tweet_line.split('-')]
+            return {
+                '{}_airport_code'.format(ldx): tweet_line_parts[0],
+                '{}_airport_time'.format(ldx): tweet_line_parts[1]
+            }
+        else:
+            return {}
+
+    @staticmethod
+    def _is_old_airport_format(tweet_line: str) -> bool:
+        tweet_line_parts = [t.strip() for t in tweet_line.split(' ') if t.strip() != '']
+        if len(tweet_line_parts) == 2 and all([re.match('[A-Z]{3}', t.strip()) for t in tweet_line_parts]):
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def _old_airport_format(tweet_line: str) -> Dict[str, str]:
+        tweet_line_parts = [t.strip() for t in tweet_line.split(' ') if t.strip() != '']
+        return {
+            'OLD_0_airport_code': tweet_line_parts[0],
+            'OLD_1_airport_code': tweet_line_parts[1]
+        }
+
+    @staticmethod
+    def _is_aircraft_format(version: str, tweet_line: str) -> bool:
+        if version == 'v1':
+            tweet_line_parts = [t.strip() for t in tweet_line.split('|')]
+            # Should have two or 3 parts
+            split_by_pipe = len(tweet_line_parts) in [2, 3]
+            if not split_by_pipe:
+                return split_by_pipe
+
+            # No line part should be more than 7 characters or less than 2
+            for tweet_line_part in tweet_line_parts:
+                if len(tweet_line_part) > 7 or len(tweet_line_part) < 2:
+                    return False
+            return True
+
+    @staticmethod
+    def _aircraft_format(version: str, tweet_line: str) -> Dict[str, str]:
+        if version == 'v1':
+            tweet_line_parts = [t.strip() for t in tweet_line.split('|')]
+            tail_no, routing_no, aircraft_type = None, None, None
+            for idx, tweet_line_part in enumerate(tweet_line_parts):
+                # Capture the international tail-nos
+                if tweet_line_part in [
+                    'TF-FIO', 'CGBIK', 'CGJVX', 'F-HNCO', 'CFYKR', 'C-GBIK', 'C-GBHN', 'C-GJWI', 'C-FYKR',
+                    'C-GBIA', 'C-FGJI',
+                ]:
+                    tail_no = tweet_line_part
+                    continue
+                # Capture the canadian ones
+                if idx in [0, 1] and re.match('^C-?[A-Z]{4}', tweet_line_part):
+                    tail_no = tweet_line_part
+                    continue
+                # Capture the mexican ones
+                if idx == 0 and re.match('^XA-[A-Z]{3}', tweet_line_part):
+                    tail_no = tweet_line_part
+                    continue
+                # If it starts with N and has at least one number, and more than 3 characters it is a tail_no
+                # https://en.wikipedia.org/wiki/Aircraft_registration
+                if tweet_line_part.startswith('N') and \
+                        re.match(r'.*\d.*', tweet_line_part) and \
+                        len(tweet_line_part) > 3:
+                    tail_no = tweet_line_part
+                    continue
+
+                # If it starts with a capital letter, has 2, 3, or 4 characters -> Then it is an aircraft-type
+                # https://en.wikipedia.org/wiki/List_of_aircraft_type_designators
+                elif re.match('^[A-Z]', tweet_line_part) and len(tweet_line_part) in [2, 3, 4]:
+                    aircraft_type = tweet_line_part
+                    continue
+
+                # If it starts with 2 or 3 Capital letters then 1-4 digits then it is a routing number
+                elif re.match('^[A-Z]{2,3}[0-9]{1,4}', tweet_line_part):
+                    routing_no = tweet_line_part
+                    continue
+
+            return {
+                'tail_no': tail_no,
+                'aircraft_type': aircraft_type,
+                'routing_no': routing_no
+            }
+        else:
+            return {}
+
+    @staticmethod
+    def _is_layover_format(version: str, tweet_line: str) -> bool:
+        if version == 'v1':
+            # If the pipe operate splits it into two and the first part is split into two by a dash then it is a layover
+            if len(tweet_line.split('|')) == 2 and len(tweet_line.split('|')[0].split('-')) == 2:
+                return True
+            else:
+                return False
+        else:
+            return False
+
+    @staticmethod
+    def _layover_format(version: str, ldx: int, tweet_line: str) -> Dict[str, str]:
+        if version == 'v1':
+            tweet_line_parts = [t.strip() for t in tweet_line.split('|')[0].split('-')]
+            return {
+                '{}_airport_code'.format(ldx): tweet_line_parts[0],
+                '{}_airport_time'.format(ldx): tweet_line_parts[1]
+            }
+        else:
+            return {}
+
+    def _parse_tweet(self, version: str, tweet: str) -> Dict[str, str]:
+        """
+        Parse a tweet based on observed logic
+        """
+        result = {}
+        if version == 'v1':
+            # Strip emojis
+            tweet = '\n'.join([self.remove_emojis(tweet_line) for tweet_line in tweet.split('\n')])
+            # iterate over the lines in the tweet
+            for ldx, tweet_line in enumerate(tweet.split('\n')):
+                # Check for a layover line
+                if self._is_layover_format(version, tweet_line):
+                    result.update(self._layover_format(version, ldx, tweet_line))
+                    continue
+
+                # Airport code + arrival / layover / departure time
+                if self._is_airport_format(version, tweet_line):
+                    result.update(self._airport_format(version, ldx, tweet_line))
+                    continue
+
+                # Older airport format
+                if self._is_old_airport_format(tweet_line):
+                    result.update(self._old_airport_format(tweet_line))
+                    continue
+
+                # Aircraft line for routing_no, aircraft_type, and tail_no
+                if self._is_aircraft_format(version, tweet_line):
+                    result.update(self._aircraft_format(version, tweet_line))
+                    continue
+
+            # Parse intermediate keys for airports / times for ordinal deparatures / layovers / arrivals
+            if len(result) > 0:
+                # Convert the "first" airport code / time to "Departure" and last to "arrival"
+                airport_codes = [int(a[0]) for a in result.keys() if re.match('[0-9]_airport_code', a)]
+                if len(airport_codes) > 0:
+                    min_code, max_code = min(airport_codes), max(airport_codes)
+                    result['departure'] = result[str(min_code) + '_airport_code']
+                    result['departure_time'] = result[str(min_code) + '_airport_time']
+                    result['arrival'] = result[str(max_code) + '_airport_code']
+                    result['arrival_time'] = result[str(max_code) + '_airport_time']
+
+                    # Add a layover if there are 3 entries for airport-codes / times
+                    if max_code - min_code == 3:
+                        result['layover'] = result['{}_airport_code'.format(max_code - 1)]
+                        result['layover_time'] = result['{}_airport_time'.format(max_code - 1)]
+                elif 'OLD_0_airport_code' in result.keys() and 'OLD_1_airport_code' in result.keys():
+                    result['departure'] = result['OLD_0_airport_code']
+                    result['arrival'] = result['OLD_1_airport_code']
+
+                # Drop intermediate keys
+                drops = []
+                for key in result.keys():
+                    if 'airport_code' in key or 'airport_time' in key:
+                        drops.append(key)
+                for drop in drops:
+                    result.pop(drop)
+            return result
+
+        else:
+            return {}
+
+
+def _legacy_classify(line: str) -> str:
+    if LegacyParser._is_layover_format('v1', line):
+        return 'layover'
+    if LegacyParser._is_airport_format('v1', line):
+        return 'airport'
+    if LegacyParser._is_old_airport_format(line):
+        return 'old_airport'
+    if LegacyParser._is_aircraft_format('v1', line):
+        return 'aircraft'
+
+
+def _rate(func: Callable, items: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def bench_line_grammar(num_tweets: int = 20000, repeat: int = 3, seed: int = 0) -> Dict[str, float]:
+    """
+    Lines and tweets per second for the legacy classifiers vs the compiled line grammar
+    """
+    tweets = tweet_texts(num_tweets, seed=seed)
+    lines = [line for tweet in tweets for line in tweet.split('\n')]
+    legacy = LegacyParser()
+    return {
+        'lines': len(lines),
+        'tweets': len(tweets),
+        'legacy_lines_per_sec': _rate(lambda line: _legacy_classify(LegacyParser.remove_emojis(line)), lines, repeat),
+        'grammar_lines_per_sec': _rate(lambda line: GRAMMAR.classify(EMOJIS.sub('', line).strip()), lines, repeat),
+        'legacy_tweets_per_sec': _rate(lambda tweet: legacy._parse_tweet('v1', tweet), tweets, repeat),
+        'grammar_tweets_per_sec': _rate(lambda tweet: Parser._parse_tweet('v1', tweet), tweets, repeat),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_tweets', type=int, required=False, default=20000)
+    parser.add_argument('--repeat', type=int, required=False, default=3)
+    args = parser.parse_args()
+    for key, value in bench_line_grammar(args.num_tweets, args.repeat).items():
+        print('{:<24} {:>14,.0f}'.format(key, value))
@@ -0,0 +1,117 @@
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import pandas as pd
+
+from twitter.config import Config, logger
+from twitter.api import TwitterPull
+from twitter.api.instrument import reset_peak_rss, peak_rss
+from benchmarks.synthetic import statuses
+from benchmarks.mock_archive import MockArchive
+
+
+SIZES = [1000, 10000, 100000, 1000000]
+STAGES = ['etl', 'parse', 'save', 'diagnostics']
+START, END = '2016-12-01', '2021-01-01'
+
+
+class BenchPull(TwitterPull):
+    """
+    Walk the whole synthetic timeline back, however many tweets are in it
+    """
+    min_date = pd.Timestamp(START)
+    max_tweets = 10 ** 8
+
+
+def _measure(func: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    reset_peak_rss()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func()
+    return result, {
+        'seconds': time.perf_counter() - wall,
+        'cpu_seconds': time.process_time() - cpu,
+        'peak_rss_mb': peak_rss(),
+    }
+
+
+def bench_pipeline(num_tweets: int, seed: int = 0, latency: float = 0.,
+                   requests_per_minute: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Run etl -> parse -> save -> diagnostics against the mock archive, timing each stage
+    """
+    Config.DATA_DIR = tempfile.mkdtemp()
+    try:
+        archive = MockArchive(statuses(num_tweets, seed=seed, start=START, end=END), latency=latency,
+                              requests_per_minute=requests_per_minute)
+        api = BenchPull('bench', api=archive)
+        results = {}
+        _, results['etl'] = _measure(lambda: api.etl(to_date=END))
+        results['etl'].update(tweets=api.store.manifest()['count'], api_requests=archive.num_requests,
+                              api_waits=archive.num_waits)
+        df, results['parse'] = _measure(lambda: api.parse_raw_tweets(api.etl()))
+        results['parse']['tweets'] = num_tweets
+        _, results['save'] = _measure(lambda: api.save_parsed(df))
+        _, results['diagnostics'] = _measure(lambda: api.diagnostics(df))
+        for stage in ['save', 'diagnostics']:
+            results[stage]['tweets'] = df.shape[0]
+        for result in results.values():
+            result['tweets_per_sec'] = result['tweets'] / result['seconds']
+        return results
+    finally:
+        shutil.rmtree(Config.DATA_DIR)
+
+
+def _run_size(num_tweets: int, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """
+    Each size runs in a fresh interpreter so peak memory is not inherited from the smaller runs
+    """
+    command = [sys.executable, '-m', 'benchmarks.bench_pipeline', '--single', str(num_tweets),
+               '--seed', str(args.seed), '--latency', str(args.latency)]
+    if args.requests_per_minute is not None:
+        command += ['--requests_per_minute', str(args.requests_per_minute)]
+    if args.verbose:
+        command += ['--verbose']
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output.decode('utf-8').strip().split('\n')[-1])
+
+
+def _report(results: Dict[int, Dict[str, Dict[str, float]]]) -> List[str]:
+    rows = ['{:>10} {:<12} {:>14} {:>10} {:>10} {:>12}'.format(
+        'tweets', 'stage', 'tweets/sec', 'wall (s)', 'cpu (s)', 'peak rss MB')]
+    for num_tweets, stages in results.items():
+        for stage in STAGES:
+            result = stages[stage]
+            rows.append('{:>10,} {:<12} {:>14,.0f} {:>10.2f} {:>10.2f} {:>12.0f}'.format(
+                num_tweets, stage, result['tweets_per_sec'], result['seconds'], result['cpu_seconds'],
+                result['peak_rss_mb']))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', required=False, default=SIZES)
+    parser.add_argument('--seed', type=int, required=False, default=0)
+    parser.add_argument('--latency', type=float, required=False, default=0.)
+    parser.add_argument('--requests_per_minute', type=float, required=False, default=None)
+    parser.add_argument('--output', type=str, required=False, default=None)
+    parser.add_argument('--single', type=int, required=False, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.single is not None:
+        if not args.verbose:
+            logger.setLevel(logging.WARNING)
+        print(json.dumps(bench_pipeline(args.single, args.seed, args.latency, args.requests_per_minute)))
+    else:
+        results = {num_tweets: _run_size(num_tweets, args) for num_tweets in args.sizes}
+        print('\n'.join(_report(results)))
+        if args.output is not None:
+            with open(args.output, 'w') as fp:
+                json.dump(results, fp, indent=2)
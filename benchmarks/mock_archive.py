@@ -0,0 +1,96 @@
+import time
+import datetime
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import requests
+import tweepy
+
+from twitter.api.records import created_at_epochs
+
+
+class MockStatus(object):
+    """
+    What tweepy hands back for each result, the pipeline only reads _json
+    """
+    __slots__ = ('_json',)
+
+    def __init__(self, status: Dict[str, Any]):
+        self._json = status
+
+
+class MockArchive(object):
+    """
+    Local stand-in for the premium full archive search: date windowed queries, newest first, paged with next tokens,
+    with optional per-request latency and a requests-per-minute limit that either blocks like wait_on_rate_limit or
+    answers 429 like the live api
+    """
+    def __init__(self, statuses: List[Dict[str, Any]], latency: float = 0., requests_per_minute: Optional[float] = None,
+                 max_results: int = 500, on_limit: str = 'wait'):
+        self.statuses = sorted(statuses, key=lambda t: t['id'], reverse=True)
+        # Descending timestamps negated so the windows are found with searchsorted
+        self.epochs = -created_at_epochs([t['created_at'] for t in self.statuses])
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.max_results = max_results
+        self.on_limit = on_limit
+        self.num_requests = 0
+        self.num_waits = 0
+        self.num_limited = 0
+        self._requests = deque()
+        self._lock = threading.Lock()
+
+    def verify_credentials(self) -> bool:
+        return True
+
+    def _throttle(self):
+        with self._lock:
+            self.num_requests += 1
+            if self.requests_per_minute is None:
+                return
+            now = time.monotonic()
+            while len(self._requests) > 0 and now - self._requests[0] >= 60.:
+                self._requests.popleft()
+            if len(self._requests) >= self.requests_per_minute:
+                if self.on_limit == 'raise':
+                    self.num_limited += 1
+                    raise self._too_many_requests()
+                self.num_waits += 1
+                time.sleep(60. - (now - self._requests[0]))
+                self._requests.popleft()
+            self._requests.append(time.monotonic())
+
+    @staticmethod
+    def _too_many_requests() -> Exception:
+        response = requests.Response()
+        response.status_code, response.reason = 429, 'Too Many Requests'
+        response._content = b'{"errors": [{"code": 88, "message": "Rate limit exceeded"}]}'
+        return tweepy.TooManyRequests(response)
+
+    @staticmethod
+    def _epoch(date: str) -> int:
+        return np.datetime64(datetime.datetime.strptime(date, '%Y%m%d%H%M'), 'ns').astype('int64')
+
+    def search_full_archive(self, label: str, query: str, fromDate: Optional[str] = None,
+                            toDate: Optional[str] = None, maxResults: int = 100, next: Optional[int] = None,
+                            return_cursors: bool = False):
+        """
+        Statuses with fromDate <= created_at < toDate, 30 days back from toDate when there is no fromDate
+        """
+        self._throttle()
+        if self.latency > 0:
+            time.sleep(self.latency)
+        to_epoch = self._epoch(toDate) if toDate is not None else np.iinfo('int64').max
+        from_epoch = self._epoch(fromDate) if fromDate is not None else to_epoch - 30 * 24 * 3600 * 10 ** 9
+        first = np.searchsorted(self.epochs, -to_epoch, side='right')
+        last = np.searchsorted(self.epochs, -from_epoch, side='right')
+        start = first if next is None else next
+        stop = min(start + min(maxResults, self.max_results), last)
+        page = [MockStatus(t) for t in self.statuses[start:stop]]
+        if stop < last:
+            return page, int(stop)
+        return page
+
+    search_full_archive.pagination_mode = 'next'
@@ -0,0 +1,102 @@
+import random
+import datetime
+from typing import List, Dict, Any
+
+AIRPORTS = ['DFW', 'LAS', 'LAX', 'JFK', 'ORD', 'ATL', 'DEN', 'SEA', 'BOS', 'MIA', 'PHX', 'MSP', 'YYZ', 'MEX']
+AIRCRAFT_TYPES = ['B738', 'A320', 'B752', 'E190', 'MD88', 'A321', 'B712', 'CRJ9', 'B763', 'A319']
+TAIL_NOS = ['N123AB', 'N7712K', 'N4501', 'N801NW', 'C-GBIK', 'CFYKR', 'XA-ABC', 'TF-FIO']
+TIME_ZONES = ['CST', 'PST', 'EDT', 'MST', 'UTC+1']
+TEAMS = [
+    ('dallascowboys', 'Dallas Cowboys'),
+    ('Lakers', 'Los Angeles Lakers'),
+    ('nyjets', 'New York Jets'),
+    ('MiamiHEAT', 'Miami HEAT'),
+    ('Avalanche', 'Colorado Avalanche'),
+]
+
+
+def _time(rng: random.Random) -> str:
+    return '{}:{:02d}{}m {}'.format(rng.randint(1, 12), rng.randint(0, 59), rng.choice('ap'), rng.choice(TIME_ZONES))
+
+
+def _aircraft_line(rng: random.Random) -> str:
+    parts = [rng.choice(TAIL_NOS), rng.choice(AIRCRAFT_TYPES), '{}{}'.format(rng.choice(['AAL', 'DAL', 'UA']),
+                                                                            rng.randint(1, 9999))]
+    return ' | '.join(rng.sample(parts, rng.choice([2, 3])))
+
+
+def tweet_text(rng: random.Random) -> str:
+    """
+    One tweet: v1 airport lines with an optional layover, the old two airport format, or chatter
+    """
+    team = rng.choice(TEAMS)
+    departure, layover, arrival = rng.sample(AIRPORTS, 3)
+    draw = rng.random()
+    if draw < 0.45:
+        lines = [
+            u'✈️ @{} \U0001F3C8'.format(team[0]),
+            '{} - {}'.format(departure, _time(rng)),
+            '{} - {}'.format(arrival, _time(rng)),
+            _aircraft_line(rng),
+            'https://t.co/{}'.format(rng.randint(10 ** 6, 10 ** 7)),
+        ]
+    elif draw < 0.6:
+        lines = [
+            '@{}'.format(team[0]),
+            '{} - {}'.format(departure, _time(rng)),
+            '{} - {} | {}h{}m'.format(layover, _time(rng), rng.randint(0, 3), rng.randint(0, 59)),
+            '{} - {}'.format(layover, _time(rng)),
+            '{} - {}'.format(arrival, _time(rng)),
+            _aircraft_line(rng),
+        ]
+    elif draw < 0.8:
+        lines = ['@{}'.format(team[0]), '{} {}'.format(departure, arrival), _aircraft_line(rng)]
+    elif draw < 0.9:
+        lines = ['RT @{}: {} - {}'.format(team[0], departure, _time(rng))]
+    else:
+        lines = ['Wheels up for @{} \U0001F600'.format(team[0]), 'Great season everyone', 'https://t.co/abc']
+    return '\n'.join(lines)
+
+
+def tweet_texts(num_tweets: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [tweet_text(rng) for _ in range(num_tweets)]
+
+
+def status(rng: random.Random, tweet_id: int, created_at: datetime.datetime) -> Dict[str, Any]:
+    """
+    A search_full_archive status json carrying only the fields the pipeline reads, plus a user object for bulk
+    """
+    text = tweet_text(rng)
+    mention = text.split('@')[1].split()[0].rstrip(':') if '@' in text else None
+    team = [t for t in TEAMS if t[0] == mention]
+    tweet = {
+        'id': tweet_id,
+        'created_at': created_at.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        'text': text[:140],
+        'truncated': len(text) > 140,
+        'user': {'id': 1, 'screen_name': 'SportsAviation', 'name': 'Sports Aviation', 'followers_count': 10000},
+        'entities': {
+            'user_mentions': [{'screen_name': team[0][0], 'name': team[0][1]}] if len(team) > 0 else [],
+            'urls': [{'url': 'https://t.co/{}'.format(tweet_id % 10 ** 7)}] if rng.random() < 0.9 else [],
+        },
+        'retweet_count': rng.randint(0, 50),
+        'favorite_count': rng.randint(0, 200),
+        'in_reply_to_user_id': 2 if rng.random() < 0.05 else None,
+        'is_quote_status': rng.random() < 0.03,
+    }
+    if len(text) > 140:
+        tweet['extended_tweet'] = {'full_text': text}
+    return tweet
+
+
+def statuses(num_tweets: int, seed: int = 0, start: str = '2016-12-01',
+             end: str = '2021-01-01') -> List[Dict[str, Any]]:
+    """
+    Statuses evenly spread from start to end, oldest first with increasing ids. Tweets before 2017-01-03 fall in the
+    old (v2) parsing version
+    """
+    rng = random.Random(seed)
+    start_, end_ = datetime.datetime.strptime(start, '%Y-%m-%d'), datetime.datetime.strptime(end, '%Y-%m-%d')
+    step = (end_ - start_) / max(num_tweets, 1)
+    return [status(rng, 10 ** 17 + idx, start_ + idx * step) for idx in range(num_tweets)]
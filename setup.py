@@ -7,15 +7,20 @@ setup(
     author='Scott P. White',
     author_email='spwhite1337@gmail.com',
     packages=find_packages(),
+    package_data={'twitter.api': ['rules/*.json', 'reference/*.csv']},
     entry_points={'console_scripts': [
-        'tw_pull = twitter.tweets:twitter_pull'
+        'tw_pull = twitter.tweets:twitter_pull',
+        'tw_query = twitter.tweets:twitter_query',
+        'tw_agg = twitter.tweets:twitter_aggregate',
     ]},
     install_requires=[
         'pandas',
         'numpy',
         'openpyxl',
+        'pyarrow',
         'tqdm',
         'matplotlib',
+        'pypdf',
         # Install tweepy from git to get premium api access
         # 'tweepy',
         'tweepy @ git+https://github.com/tweepy/tweepy@master',
@@ -0,0 +1,12 @@
+import pytest
+
+from twitter.config import Config
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """
+    Every test writes its stores, parsed tweets and indexes under its own directory
+    """
+    monkeypatch.setattr(Config, 'DATA_DIR', str(tmp_path))
+    return str(tmp_path)
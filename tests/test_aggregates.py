@@ -0,0 +1,70 @@
+import os
+import pandas as pd
+
+from benchmarks.bench_pipeline import BenchPull, START, END
+from benchmarks.mock_archive import MockArchive
+from benchmarks.synthetic import statuses
+from twitter.api.aggregates import FlightAggregates
+
+
+def _parsed(rows):
+    columns = ['tweet_id', 'created_at', 'team_name', 'flightware_link', 'departure', 'arrival', 'aircraft_type',
+               'tail_no', 'parsed', 'parsed_w_routing_no', 'p_version']
+    df = pd.DataFrame(rows, columns=columns)
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df
+
+
+def _flight(tweet_id, created_at, departure='DFW'):
+    return (tweet_id, created_at, 'Cowboys', 'https://flightaware.com/x', departure, 'LAS', 'B738', 'N123AB', True,
+            False, 'v1')
+
+
+def test_same_hash_adds_nothing(tmp_path):
+    aggregates = FlightAggregates(path=os.path.join(str(tmp_path), 'aggregates.sqlite'))
+    df = _parsed([_flight(1, '2019-01-01 10:00:00'), _flight(2, '2019-01-02 10:00:00'),
+                  (3, '2019-01-02 11:00:00', 'None', 'None', None, None, None, None, False, False, 'v1')])
+    assert aggregates.update('acct', df, {'v1': 'a'}) == 2
+    assert aggregates.update('acct', df, {'v1': 'a'}) == 0
+    assert aggregates.rollup(grain='all')['tweets'].tolist() == [2]
+
+
+def test_hash_change_moves_the_count(tmp_path):
+    aggregates = FlightAggregates(path=os.path.join(str(tmp_path), 'aggregates.sqlite'))
+    aggregates.update('acct', _parsed([_flight(1, '2019-01-01 10:00:00'), _flight(2, '2019-01-02 10:00:00')]),
+                      {'v1': 'a'})
+    reparsed = _parsed([_flight(1, '2019-01-01 10:00:00', departure='MIA'), _flight(2, '2019-01-02 10:00:00')])
+    assert aggregates.update('acct', reparsed, {'v1': 'b'}) == 2
+    assert aggregates.rollup(grain='all')['tweets'].tolist() == [2]
+    df = aggregates.rollup(['departure_iata'], grain='all').set_index('departure_iata')['tweets']
+    assert df.to_dict() == {'DFW': 1, 'MIA': 1}
+
+
+def test_rollup_grains(tmp_path):
+    aggregates = FlightAggregates(path=os.path.join(str(tmp_path), 'aggregates.sqlite'))
+    # A Tuesday, the Sunday before it, the Monday after and a day in the next month and year
+    days = ['2019-01-01', '2018-12-30', '2019-01-07', '2019-02-15', '2020-03-01']
+    aggregates.update('acct', _parsed([_flight(i, day + ' 10:00:00') for i, day in enumerate(days)]), {'v1': 'a'})
+
+    def periods(grain):
+        df = aggregates.rollup(grain=grain)
+        return dict(zip(df['period'].dt.strftime('%Y-%m-%d'), df['tweets']))
+
+    assert periods('week') == {'2018-12-24': 1, '2018-12-31': 1, '2019-01-07': 1, '2019-02-11': 1, '2020-02-24': 1}
+    assert periods('month') == {'2018-12-01': 1, '2019-01-01': 2, '2019-02-01': 1, '2020-03-01': 1}
+    assert periods('year') == {'2018-01-01': 1, '2019-01-01': 3, '2020-01-01': 1}
+    assert aggregates.rollup(grain='year', start='2019-01-01', end='2020-01-01')['tweets'].tolist() == [3]
+
+
+def test_diagnostics_from_aggregates_match():
+    api = BenchPull('acct', api=MockArchive(statuses(3000, start=START, end=END)))
+    api.etl(to_date=END)
+    df = api.parse_raw_tweets(api.store.read(), use_cache=False)
+    assert api.aggregate_parsed(df) > 0
+
+    key = ['dimension', 'year', 'value']
+    expected = api.diagnostics(df=df, plot=False)['counts'].set_index(key)['tweet'].sort_index()
+    counts = api.diagnostics(from_aggregates=True, plot=False)['counts'].set_index(key)['tweet'].sort_index()
+    assert expected.shape[0] > 0
+    assert counts.index.equals(expected.index)
+    assert counts.astype('int64').equals(expected.astype('int64'))
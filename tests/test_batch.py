@@ -0,0 +1,42 @@
+from benchmarks.bench_pipeline import BenchPull, START, END
+from benchmarks.mock_archive import MockArchive
+from benchmarks.synthetic import statuses
+from twitter.api.batch import BatchPull
+from twitter.api.ratelimit import RateLimiter
+
+
+SCREEN_NAMES = ['acct_a', 'acct_b', 'acct_c']
+TIMELINES = {screen_name: statuses(2000, seed=seed, start=START, end=END)
+             for seed, screen_name in enumerate(SCREEN_NAMES)}
+
+
+class ArchivePull(BenchPull):
+    """
+    Every account pulled from its own mock archive
+    """
+    def __init__(self, screen_name, rate_limiter=None):
+        super().__init__(screen_name, rate_limiter=rate_limiter, api=MockArchive(TIMELINES[screen_name]))
+
+
+def test_tweet_cap_then_resume():
+    batch = BatchPull(SCREEN_NAMES, workers=3, rate_limiter=RateLimiter(requests_per_minute=6000., tweet_cap=1),
+                      puller=ArchivePull)
+    assert batch.run(to_date=END) == {}
+    assert {state['status'] for state in batch.state.values()} == {'failed'}
+    assert all('Tweet cap' in state['error'] for state in batch.state.values())
+    # The pages pulled before the cap was hit are kept
+    stored = [ArchivePull(screen_name).store.manifest()['count'] for screen_name in SCREEN_NAMES]
+    assert 0 < sum(stored) < sum(len(timeline) for timeline in TIMELINES.values())
+
+    batch = BatchPull(SCREEN_NAMES, workers=3, rate_limiter=RateLimiter(requests_per_minute=6000.),
+                      puller=ArchivePull)
+    pullers = batch.run(to_date=END, resume=True)
+    assert sorted(pullers) == SCREEN_NAMES
+    for screen_name, api in pullers.items():
+        ids = [tweet['id'] for tweet in api.store.read()]
+        assert len(ids) == len(set(ids))
+        assert sorted(ids) == sorted(tweet['id'] for tweet in TIMELINES[screen_name])
+        assert batch.state[screen_name] == {'status': 'done', 'tweets': len(ids)}
+
+    # Nothing left to pull
+    assert BatchPull(SCREEN_NAMES, puller=ArchivePull).run(to_date=END, resume=True) == {}
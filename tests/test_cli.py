@@ -0,0 +1,16 @@
+from twitter.tweets import _parser
+
+
+def test_flags_before_subcommand_are_kept():
+    args = _parser().parse_args(['--parse_workers', '4', '--screen_name', 'X', 'parse'])
+    assert (args.command, args.screen_name, args.parse_workers) == ('parse', 'X', 4)
+
+
+def test_subcommand_flags():
+    args = _parser().parse_args(['parse', '--screen_name', 'Y', '--parse_workers', '2', '--stream'])
+    assert (args.command, args.screen_name, args.parse_workers, args.stream) == ('parse', 'Y', 2, True)
+
+
+def test_defaults_without_subcommand():
+    args = _parser().parse_args(['--screen_name', 'Z'])
+    assert (args.command, args.screen_name, args.parse_workers, args.stream) == (None, 'Z', 1, False)
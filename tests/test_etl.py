@@ -0,0 +1,32 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tweepy
+
+from benchmarks.bench_pipeline import BenchPull
+
+
+class SlowAPI(object):
+    """
+    tweepy.API stand-in counting connects, slow to build so concurrent first uses overlap
+    """
+    connects = 0
+    lock = threading.Lock()
+
+    def __init__(self, auth):
+        with SlowAPI.lock:
+            SlowAPI.connects += 1
+        time.sleep(0.05)
+
+    def verify_credentials(self) -> bool:
+        return True
+
+
+def test_api_connects_once_across_threads(monkeypatch):
+    monkeypatch.setattr(tweepy, 'API', SlowAPI)
+    api = BenchPull('acct')
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        clients = list(executor.map(lambda _: api.api, range(4)))
+    assert SlowAPI.connects == 1
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks.bench_pipeline import BenchPull, START, END
+from benchmarks.mock_archive import MockArchive
+from benchmarks.synthetic import statuses
+from twitter.api.formats import STREAM_FORMATS
+
+
+@pytest.mark.parametrize('fmt', STREAM_FORMATS)
+def test_stream_without_tweets(fmt):
+    api = BenchPull('empty', api=MockArchive([]))
+    assert api.stream_parsed([], formats=[fmt], use_cache=False) == 0
+    assert api.load_parsed(fmt=fmt).shape[0] == 0
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet', 'feather'])
+def test_save_without_tweets(fmt):
+    api = BenchPull('empty', api=MockArchive([]))
+    df = api.parse_raw_tweets([], use_cache=False)
+    api.save_parsed(df, formats=[fmt])
+    assert api.load_parsed(fmt=fmt).shape[0] == 0
+
+
+def test_stream_small_chunks():
+    api = BenchPull('small', api=MockArchive(statuses(400, start=START, end=END)))
+    api.etl(to_date=END)
+    df = api.parse_raw_tweets(api.store.read(), use_cache=False)
+    assert api.stream_parsed(api.store.read(), formats=list(STREAM_FORMATS), use_cache=False, chunk_size=25) == \
+        df.shape[0]
+    for fmt in STREAM_FORMATS:
+        assert sorted(api.load_parsed(fmt=fmt)['tweet_id'].tolist()) == sorted(df['tweet_id'].tolist())
+
+
+def test_save_from_parquet_matches_direct_save():
+    api = BenchPull('acct', api=MockArchive(statuses(400, start=START, end=END)))
+    api.etl(to_date=END)
+    df = api.parse_raw_tweets(api.store.read(), use_cache=False)
+    api.save_parsed(df, formats=['csv'])
+    direct = api.load_parsed(fmt='csv')
+    api.save_parsed(df, formats=['parquet'])
+    api.save_parsed(api.load_parsed(fmt='parquet'), formats=['csv'])
+    saved = api.load_parsed(fmt='csv')
+    assert list(saved.columns) == list(direct.columns)
+    key = ['tweet_id']
+    assert saved.sort_values(key).reset_index(drop=True).equals(direct.sort_values(key).reset_index(drop=True))
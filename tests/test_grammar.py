@@ -0,0 +1,56 @@
+import json
+import os
+import pytest
+
+from twitter.api.grammar import LineGrammar, grammar, version_table, load_rules, STOP, PARTS
+
+
+def _rules(lines=(), parts=(), version='v9', effective_after=None):
+    return {'version': version, 'effective_after': effective_after, 'lines': list(lines), 'parts': list(parts),
+            'sets': {}}
+
+
+def _write(rules_dir, rules):
+    with open(os.path.join(rules_dir, '{}.json'.format(rules['version'])), 'w') as fp:
+        json.dump(rules, fp)
+
+
+def test_unknown_role():
+    with pytest.raises(ValueError, match='Unknown role'):
+        LineGrammar(_rules([{'kind': 'gate', 'role': 'gate', 'fields': [], 'pattern': '^G$'}]))
+
+
+def test_wrong_field_count():
+    with pytest.raises(ValueError, match='airport lines need 2 fields'):
+        LineGrammar(_rules([{'kind': 'airport', 'role': STOP, 'fields': ['code'], 'pattern': '^(?P<code>.*)$'}]))
+
+
+def test_part_pattern_with_groups():
+    with pytest.raises(ValueError, match='cannot have groups'):
+        LineGrammar(_rules(parts=[{'field': 'tail_no', 'pattern': '^(N)[0-9]+$'}]))
+
+
+def test_custom_rules_dir(tmp_path):
+    rules_dir = str(tmp_path)
+    _write(rules_dir, _rules(
+        [{'kind': 'airport', 'role': STOP, 'fields': ['code', 'time'], 'pattern': '^(?P<code>\\w+) @ (?P<time>.*)$'},
+         {'kind': 'aircraft', 'role': PARTS, 'fields': [], 'pattern': '^.*/.*$', 'split': '/'}],
+        [{'field': 'tail_no', 'pattern': '^N[0-9]+$'}], version='v8'))
+    _write(rules_dir, _rules(version='v9', effective_after='2020-06-01 00:00:00'))
+    rules = grammar('v8', rules_dir)
+    assert rules.version == 'v8'
+    assert [line.role for line in rules.lines('DFW @ 10:30am\nN123 / x\njunk')] == [STOP, PARTS, None]
+    assert version_table(rules_dir) == (['2020-06-01 00:00:00'], ['v8', 'v9'])
+
+
+def test_version_table_needs_one_earliest(tmp_path):
+    rules_dir = str(tmp_path)
+    _write(rules_dir, _rules(version='v8'))
+    _write(rules_dir, _rules(version='v9'))
+    with pytest.raises(ValueError, match='Exactly one rule set'):
+        version_table(rules_dir)
+
+
+def test_bundled_version_table():
+    assert version_table() == (['2017-01-03 00:00:00'], ['v2', 'v1'])
+    assert load_rules('v2')['effective_after'] is None
@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+
+from twitter.api.index import FlightIndex
+
+
+def _parsed(rows):
+    columns = ['tweet_id', 'created_at', 'tail_no', 'aircraft_type', 'routing_no', 'departure', 'arrival',
+               'team_name', 'p_version']
+    df = pd.DataFrame(rows, columns=columns)
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df
+
+
+def test_update_without_flights(tmp_path):
+    index = FlightIndex(path=os.path.join(str(tmp_path), 'index.sqlite'))
+    chatter = _parsed([(1, '2018-01-01 10:00:00', None, None, None, None, None, 'None', 'v1')])
+    assert index.update('acct', chatter, {'v1': 'a'}) == 0
+    assert index.update('acct', chatter.iloc[:0], {'v1': 'a'}) == 0
+    assert index.flights().shape[0] == 0
+
+
+def test_update_skips_indexed_flights(tmp_path):
+    index = FlightIndex(path=os.path.join(str(tmp_path), 'index.sqlite'))
+    df = _parsed([
+        (1, '2018-01-01 10:00:00', 'N123AB', 'B738', None, 'DFW', 'LAS', 'Cowboys', 'v1'),
+        (2, '2018-01-02 10:00:00', None, None, None, None, None, 'None', 'v1'),
+    ])
+    assert index.update('acct', df, {'v1': 'a'}) == 1
+    assert index.update('acct', df, {'v1': 'a'}) == 0
+    assert index.update('acct', df, {'v1': 'b'}) == 1
+    assert index.flights(tail_no='n123ab')['tweet_id'].tolist() == [1]
+
+
+def test_reparse_without_flight_drops_it(tmp_path):
+    index = FlightIndex(path=os.path.join(str(tmp_path), 'index.sqlite'))
+    flight = _parsed([(1, '2018-01-01 10:00:00', 'N123AB', 'B738', None, 'DFW', 'LAS', 'Cowboys', 'v1')])
+    assert index.update('acct', flight, {'v1': 'a'}) == 1
+    chatter = _parsed([(1, '2018-01-01 10:00:00', None, None, None, None, None, 'Cowboys', 'v1')])
+    assert index.update('acct', chatter, {'v1': 'a'}) == 0
+    assert index.flights()['tweet_id'].tolist() == [1]
+    assert index.update('acct', chatter, {'v1': 'b'}) == 0
+    assert index.flights().shape[0] == 0
@@ -0,0 +1,21 @@
+from twitter.api.lookup import normalize_airport, normalize_aircraft_type, reference
+
+
+def test_normalize_airport():
+    assert normalize_airport('dfw') == 'DFW'
+    assert normalize_airport('DFW (Love Field)') == 'DFW'
+    assert normalize_airport('KDFW') == 'DFW'
+    assert normalize_airport('TF') is None
+
+
+def test_normalize_aircraft_type():
+    assert normalize_aircraft_type('b738') == 'B738'
+    assert normalize_aircraft_type('B-738') == 'B738'
+    assert normalize_aircraft_type('UA33') is None
+
+
+def test_full_designator_list():
+    assert len(reference().aircraft_types) > 2500
+    assert normalize_aircraft_type('c172') == 'C172'
+    assert normalize_aircraft_type('A400') == 'A400'
+    assert normalize_aircraft_type('DH8-D') == 'DH8D'
@@ -0,0 +1,40 @@
+from benchmarks.bench_pipeline import BenchPull, START, END
+from benchmarks.mock_archive import MockArchive
+from benchmarks.synthetic import statuses
+from twitter.api.cache import ParseCache
+
+
+def test_cache_with_versions_out_of_order():
+    # Oldest first, so the v2 tweets before the version cutover come ahead of the v1 ones
+    tweets = sorted(statuses(3000, start=START, end=END), key=lambda tweet: tweet['id'])
+    api = BenchPull('acct', api=MockArchive([]))
+    expected = api.parse_raw_tweets(tweets, use_cache=False)
+    assert set(expected['p_version']) == {'v1', 'v2'}
+    for _ in range(2):
+        df = api.parse_raw_tweets(tweets, use_cache=True)
+        key = ['tweet_id']
+        assert df.sort_values(key).reset_index(drop=True).equals(expected.sort_values(key).reset_index(drop=True))
+
+
+def test_streamed_parse_from_cache():
+    tweets = statuses(3000, start=START, end=END)
+    api = BenchPull('acct', api=MockArchive([]))
+    expected = api.parse_raw_tweets(tweets, use_cache=False).sort_values('tweet_id').reset_index(drop=True)
+    for _ in range(2):
+        assert api.stream_parsed(tweets, formats=['csv'], use_cache=True, index=False, aggregates=False,
+                                 chunk_size=500) == expected.shape[0]
+        df = api.load_parsed(fmt='csv').sort_values('tweet_id').reset_index(drop=True)
+        assert df['tweet_id'].tolist() == expected['tweet_id'].tolist()
+        assert df['departure'].tolist() == expected['departure'].tolist()
+        assert df['tail_no'].tolist() == expected['tail_no'].tolist()
+
+
+def test_cache_reads_only_the_requested_range():
+    tweets = statuses(2000, start=START, end=END)
+    api = BenchPull('acct', api=MockArchive([]))
+    df = api.parse_raw_tweets(tweets, use_cache=True)
+    cache = ParseCache(api.save_dir, api.version)
+    hashes = {p_version: api.parser_hash(p_version) for p_version in df['p_version'].unique()}
+    ids = df['tweet_id'].sort_values().iloc[100:110]
+    assert sorted(cache.get(ids, hashes).index) == ids.tolist()
+    assert cache.get(ids.iloc[:0], hashes).shape[0] == 0
@@ -0,0 +1,80 @@
+import random
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_line_grammar import LegacyParser
+from benchmarks.synthetic import tweet_texts
+from twitter.api.columnar import parse_tweets, PARSED_COLUMNS
+from twitter.api.parser import Parser
+
+
+LEGACY = LegacyParser()
+# Line fragments the fuzzed tweets are built from
+FRAGMENTS = ['DFW - 10:30am CST', 'LAS - 1:05 pm UTC+1 | x', 'ABC DEF', ' ABC\t  DFW ', 'ABC\tDFW', '  ',
+             'N123AB | B738 | AA12', 'C-GBIK|A320', 'XA-ABC | E190', 'junk', '', 'N1 | B7', 'ABCD - 3:00pm EDT',
+             '✈ MIA - 9:15pm EST ✈', 'TF-FIO | A321 | FI614', '\t']
+EDGE_CASES = [
+    # A layover gap: four lines apart with no stop in between, the legacy parser raises a KeyError
+    'DFW - 10:30am CST\njunk\njunk\nLAS - 1:05pm CST',
+    # Stops on line 10 and later do not count
+    'DFW - 10:30am CST\n' + 'junk\n' * 9 + 'LAS - 1:05pm CST',
+    '\n' * 10 + 'DFW - 10:30am CST\nLAS - 1:05pm CST',
+    'DFW - 10:30am CST\nMIA - 11:30am EST\nATL - 1:00pm EST\nLAS - 3:05pm PST',
+    # Tabs and blank chunks in the old two airport format
+    ' ABC\t  DFW ',
+    'ABC\tDFW',
+    'ABC  \t DFW\nN123AB | B738 | AA12',
+    '',
+]
+
+
+def _fields(result: Optional[Dict[str, str]]) -> Optional[List[Optional[str]]]:
+    if result is None:
+        return None
+    return [None if pd.isna(result.get(column)) else result.get(column) for column in PARSED_COLUMNS]
+
+
+def _legacy(tweet: str) -> Optional[List[Optional[str]]]:
+    try:
+        return _fields(LEGACY._parse_tweet('v1', tweet))
+    except KeyError:
+        return None
+
+
+def _corpus() -> List[str]:
+    rng = random.Random(7)
+    fuzzed = ['\n'.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 14))) for _ in range(3000)]
+    return tweet_texts(3000, seed=1) + fuzzed + EDGE_CASES
+
+
+@pytest.fixture(scope='module')
+def corpus() -> List[str]:
+    return _corpus()
+
+
+def test_row_parser_matches_legacy(corpus):
+    for tweet in corpus:
+        expected = _legacy(tweet)
+        if expected is not None:
+            assert _fields(Parser._parse_tweet('v1', tweet)) == expected, repr(tweet)
+
+
+def test_columnar_parser_matches_legacy(corpus):
+    df = parse_tweets('v1', pd.Series(corpus, index=range(100, 100 + len(corpus)), dtype=object))
+    assert df.index.tolist() == list(range(100, 100 + len(corpus)))
+    for tweet, row in zip(corpus, df.itertuples(index=False)):
+        expected = _legacy(tweet)
+        if expected is not None:
+            assert _fields(dict(zip(PARSED_COLUMNS, row))) == expected, repr(tweet)
+
+
+def test_layover_gap_keeps_the_stops():
+    tweet = EDGE_CASES[0]
+    with pytest.raises(KeyError):
+        LEGACY._parse_tweet('v1', tweet)
+    expected = {'departure': 'DFW', 'departure_time': '10:30am CST', 'arrival': 'LAS', 'arrival_time': '1:05pm CST'}
+    assert Parser._parse_tweet('v1', tweet) == expected
+    row = parse_tweets('v1', pd.Series([tweet], dtype=object)).iloc[0]
+    assert _fields(row.to_dict()) == _fields(expected)
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from twitter.api.grammar import version_table
+from twitter.api.records import version_cutovers
+
+
+def test_version_cutover_boundary():
+    times = ['2016-12-01 00:00:00', '2017-01-03 00:00:00', '2017-01-03 00:00:01', '2020-01-01 00:00:00']
+    epochs = pd.to_datetime(times).to_numpy('datetime64[ns]').view('int64')
+    # The boundary itself still belongs to the version before it
+    assert version_cutovers(epochs, *version_table()).tolist() == ['v2', 'v2', 'v1', 'v1']
+    assert version_cutovers(epochs, ['2016-12-01 00:00:00', '2017-01-03 00:00:00'], ['a', 'b', 'c']).tolist() == [
+        'a', 'b', 'c', 'c']
@@ -0,0 +1,121 @@
+import os
+import json
+from typing import List, Optional
+
+import pytest
+
+from benchmarks.bench_pipeline import BenchPull, START, END
+from benchmarks.mock_archive import MockArchive
+from benchmarks.synthetic import statuses
+from twitter.api.store import RawStore
+
+
+def test_raw_tweets_migrates_legacy_cache():
+    tweets = statuses(300, start=START, end=END)
+    api = BenchPull('legacy', api=MockArchive([]))
+    with open(api.store.legacy_path, 'w') as fp:
+        json.dump(tweets, fp)
+    assert sorted(tweet['id'] for tweet in api.raw_tweets()) == sorted(tweet['id'] for tweet in tweets)
+    assert api.parse_raw_tweets(api.raw_tweets(), use_cache=False).shape[0] > 0
+
+
+class FlakyArchive(object):
+    """
+    MockArchive whose search dies with a connection error on one call, like a pull killed mid-way
+    """
+    def __init__(self, archive: MockArchive, fail_at: Optional[int] = None):
+        self.archive, self.fail_at, self.calls = archive, fail_at, 0
+
+        def search(*args, **kwargs):
+            self.calls += 1
+            if self.calls == self.fail_at:
+                raise ConnectionError('Connection reset')
+            return archive.search_full_archive(*args, **kwargs)
+        search.pagination_mode = 'next'
+        self.search_full_archive = search
+
+    def verify_credentials(self) -> bool:
+        return True
+
+
+class CompressedPull(BenchPull):
+    raw_compress = True
+
+
+TWEETS = statuses(3000, start=START, end=END)
+
+
+def _stored_ids(api: BenchPull) -> List[int]:
+    return [tweet['id'] for tweet in api.store.read()]
+
+
+def _half_write(store: RawStore):
+    with store._open(store.parts()[-1], 'a') as fp:
+        fp.write('{"id": 12, "crea')
+
+
+def _assert_complete(api: BenchPull):
+    ids = _stored_ids(api)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(tweet['id'] for tweet in TWEETS)
+    assert api.store.manifest()['count'] == len(TWEETS)
+    assert len(api.store.ids()) == len(TWEETS)
+    assert api.store.checkpoint() is None
+
+
+@pytest.mark.parametrize('puller', [BenchPull, CompressedPull])
+@pytest.mark.parametrize('shards', [1, 3])
+@pytest.mark.parametrize('fail_at', [3, 6])
+def test_resume_after_failure(puller, shards, fail_at):
+    api = puller('acct', api=FlakyArchive(MockArchive(TWEETS), fail_at=fail_at))
+    with pytest.raises(ConnectionError):
+        api.etl(to_date=END, shards=shards)
+    assert api.store.checkpoint() is not None
+    # The last status of the raw store, or of every shard pulled into so far, is cut off mid-line
+    shard_dir = os.path.join(api.save_dir, 'shards')
+    stores = [api.store] + [
+        RawStore(os.path.join(shard_dir, name), api.version, compress=api.raw_compress)
+        for name in (sorted(os.listdir(shard_dir)) if os.path.exists(shard_dir) else [])
+    ]
+    stores = [store for store in stores if store.exists()]
+    assert len(stores) > 0
+    for store in stores:
+        _half_write(store)
+    resumed = puller('acct', api=FlakyArchive(MockArchive(TWEETS)))
+    resumed.etl(to_date=END, shards=shards)
+    _assert_complete(resumed)
+
+
+@pytest.mark.parametrize('puller', [BenchPull, CompressedPull])
+def test_repair_half_written_line(puller):
+    api = puller('acct', api=MockArchive(TWEETS))
+    api.etl(to_date=END)
+    _half_write(api.store)
+    store = puller('acct', api=MockArchive(TWEETS)).store
+    assert store.repair()
+    assert not store.repair()
+    assert sorted(tweet['id'] for tweet in store.read()) == sorted(tweet['id'] for tweet in TWEETS)
+
+
+def test_id_log_rebuilt():
+    api = BenchPull('acct', api=MockArchive(TWEETS))
+    api.etl(to_date=END)
+    # A stale id log is rebuilt from the parts
+    with open(api.store.ids_path, 'r+b') as fp:
+        fp.truncate(80)
+    store = BenchPull('acct', api=MockArchive(TWEETS)).store
+    assert len(store.ids()) == len(TWEETS)
+    assert os.path.getsize(store.ids_path) == 8 * len(TWEETS)
+
+    # Statuses on disk that the manifest and id log never saw, as left by a pull killed between the two writes
+    extra = [dict(tweet, id=tweet['id'] + 10 ** 12) for tweet in TWEETS[:10]]
+    with store._open(store.parts()[-1], 'a') as fp:
+        fp.write(''.join(json.dumps(tweet) + '\n' for tweet in extra))
+    store = BenchPull('acct', api=MockArchive(TWEETS)).store
+    store.set_checkpoint({'stage': 'walk_back', 'to_date': END, 'next': None, 'num_tweets': 0, 'oldest': None})
+    assert store.repair()
+    assert store.manifest()['count'] == len(TWEETS) + len(extra)
+    assert len(store.ids()) == len(TWEETS) + len(extra)
+    assert store.checkpoint()['stage'] == 'walk_back'
+    # Appending them again adds nothing
+    assert store.append(extra) == 0
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Optional, Any
+import pandas as pd
+
+from twitter.config import Config
+from twitter.api.lookup import validate
+
+
+# Key of the daily counts besides screen_name and day, airports and aircraft types are the validated codes
+DIMENSIONS = ['team_name', 'departure_iata', 'arrival_iata', 'aircraft_type_icao', 'tail_no', 'parsed',
+              'parsed_w_routing_no']
+FLAG_COLUMNS = ['parsed', 'parsed_w_routing_no']
+CODE_COLUMNS = ['departure_iata', 'arrival_iata', 'aircraft_type_icao', 'tail_no']
+KEY_COLUMNS = ['screen_name', 'day'] + DIMENSIONS
+# First day of the period each day rolls up to, 'all' sums over every day
+GRAINS = {
+    'day': 'day',
+    'week': "date(day, '-6 days', 'weekday 1')",
+    'month': "substr(day, 1, 7) || '-01'",
+    'year': "substr(day, 1, 4) || '-01-01'",
+    'all': None,
+}
+
+
+class FlightAggregates(object):
+    """
+    Tweets per day of every tracked account by team, route, aircraft type and tail number in one SQLite file, kept up
+    to date from newly parsed tweets so reports roll up the small count table instead of rescanning tweets. Only
+    flight posts (with a team name and a flightaware link) are counted, a missing code is stored as ''
+    """
+    def __init__(self, path: Optional[str] = None, version: str = Config.version):
+        self.path = os.path.join(Config.DATA_DIR, 'aggregates_{}.sqlite'.format(version)) if path is None else path
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            # The key each counted tweet went to, so a re-parsed tweet can be moved out of it
+            conn.execute('CREATE TABLE IF NOT EXISTS ingested (screen_name TEXT NOT NULL, tweet_id INTEGER NOT NULL, '
+                         'parser_hash TEXT NOT NULL, {}, PRIMARY KEY (screen_name, tweet_id)) WITHOUT ROWID'.format(
+                             ', '.join('{} NOT NULL'.format(column) for column in KEY_COLUMNS[1:])))
+            conn.execute('CREATE TABLE IF NOT EXISTS daily_counts ({}, tweets INTEGER NOT NULL, PRIMARY KEY ({})) '
+                         'WITHOUT ROWID'.format(', '.join('{} NOT NULL'.format(column) for column in KEY_COLUMNS),
+                                                ', '.join(KEY_COLUMNS)))
+            conn.execute('CREATE INDEX IF NOT EXISTS daily_counts_by_day ON daily_counts (day)')
+
+    @staticmethod
+    def _keys(screen_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        df = validate(df)
+        keys = pd.DataFrame({
+            'tweet_id': df['tweet_id'].astype('int64'),
+            'screen_name': screen_name,
+            'day': pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d'),
+        })
+        for column in DIMENSIONS:
+            if column in FLAG_COLUMNS:
+                keys[column] = df[column].fillna(False).astype(int)
+            else:
+                keys[column] = df[column].astype(object).where(df[column].notna() & (df[column] != 'None'), '')
+        return keys
+
+    def update(self, screen_name: str, df: pd.DataFrame, hashes: Dict[str, str]) -> int:
+        """
+        Count the flight posts of an account's parsed tweets, skipping tweets already counted by the same parser
+        rules and moving re-parsed ones to their new key. Returns the number of tweets counted
+        """
+        df = df[(df['team_name'] != 'None') & (df['flightware_link'] != 'None')]
+        df = df[~df['tweet_id'].duplicated()]
+        keys = self._keys(screen_name, df).assign(parser_hash=df['p_version'].map(hashes))
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            # Only the primary key range of these tweets, chunks of a streamed parse stay cheap to add
+            ingested = pd.read_sql_query(
+                'SELECT tweet_id, parser_hash, {} FROM ingested WHERE screen_name = ? AND tweet_id BETWEEN ? AND ?'
+                .format(', '.join(KEY_COLUMNS)), conn,
+                params=[screen_name, int(keys['tweet_id'].min()) if keys.shape[0] > 0 else 0,
+                        int(keys['tweet_id'].max()) if keys.shape[0] > 0 else 0])
+            counted = keys['tweet_id'].map(ingested.set_index('tweet_id')['parser_hash'])
+            keys = keys[counted != keys['parser_hash']]
+            stale = ingested[ingested['tweet_id'].isin(keys['tweet_id'])]
+
+            deltas = pd.concat([keys[KEY_COLUMNS].assign(tweets=1), stale[KEY_COLUMNS].assign(tweets=-1)])
+            deltas = deltas.groupby(KEY_COLUMNS).agg(tweets=('tweets', 'sum')).reset_index()
+            deltas = deltas[deltas['tweets'] != 0]
+            conn.executemany(
+                'INSERT INTO daily_counts ({0}, tweets) VALUES ({1}, ?) ON CONFLICT ({0}) DO UPDATE SET '
+                'tweets = tweets + excluded.tweets'.format(', '.join(KEY_COLUMNS), ', '.join('?' * len(KEY_COLUMNS))),
+                deltas.astype(object).itertuples(index=False, name=None))
+            if stale.shape[0] > 0:
+                conn.execute('DELETE FROM daily_counts WHERE screen_name = ? AND tweets <= 0', [screen_name])
+
+            columns = ['tweet_id', 'parser_hash'] + KEY_COLUMNS
+            conn.executemany('INSERT OR REPLACE INTO ingested ({}) VALUES ({})'.format(
+                ', '.join(columns), ', '.join('?' * len(columns))), keys[columns].astype(object).itertuples(
+                    index=False, name=None))
+        return keys.shape[0]
+
+    def rollup(self, dimensions: Optional[List[str]] = None, grain: str = 'year',
+               screen_names: Optional[List[str]] = None, start: Optional[str] = None, end: Optional[str] = None,
+               filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Tweets per period of a time grain (day, week, month, year or all) by any of screen_name and DIMENSIONS, summed
+        across every account unless screen_names are given. filters are exact dimension values, start inclusive and
+        end exclusive on the day. Periods are in order and the largest counts first within each
+        """
+        dimensions = [] if dimensions is None else list(dimensions)
+        for column in dimensions + list(filters or {}):
+            if column not in ['screen_name'] + DIMENSIONS:
+                raise ValueError('Unknown dimension {}, expected one of {}'.format(
+                    column, ['screen_name'] + DIMENSIONS))
+        if grain not in GRAINS:
+            raise ValueError('Unknown grain {}, expected one of {}'.format(grain, list(GRAINS)))
+
+        clauses, params = [], []
+        if screen_names is not None:
+            clauses.append('screen_name IN ({})'.format(', '.join('?' * len(screen_names))))
+            params += list(screen_names)
+        for column, value in (filters or {}).items():
+            clauses.append('{} = ?'.format(column))
+            params.append(int(value) if column in FLAG_COLUMNS else value.upper() if column in CODE_COLUMNS else value)
+        if start is not None:
+            clauses.append('day >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            clauses.append('day < ?')
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+
+        groups = ([] if GRAINS[grain] is None else ['period']) + dimensions
+        selects = ([] if GRAINS[grain] is None else ['{} AS period'.format(GRAINS[grain])]) + [
+            column if column in FLAG_COLUMNS else "NULLIF({0}, '') AS {0}".format(column) for column in dimensions]
+        query = 'SELECT {} FROM daily_counts'.format(', '.join(selects + ['SUM(tweets) AS tweets']))
+        if len(clauses) > 0:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        if len(groups) > 0:
+            query += ' GROUP BY {}'.format(', '.join(groups))
+        query += ' ORDER BY {}tweets DESC'.format('' if GRAINS[grain] is None else 'period, ')
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        with closing(sqlite3.connect(self.path)) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        if 'period' in df.columns:
+            df['period'] = pd.to_datetime(df['period'])
+        for column in dimensions:
+            if column in FLAG_COLUMNS:
+                df[column] = df[column].astype(bool)
+        df['tweets'] = df['tweets'].fillna(0).astype('int64')
+        return df
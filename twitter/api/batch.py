@@ -0,0 +1,96 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Type
+
+from twitter.config import Config, logger
+from twitter.api.etl import ETL
+from twitter.api.ratelimit import RateLimiter
+
+
+def read_screen_names(path: str) -> List[str]:
+    """
+    One screen name per line, blank lines and # comments are skipped
+    """
+    with open(path, 'r') as fp:
+        lines = [line.split('#')[0].strip() for line in fp]
+    return [line for line in lines if line != '']
+
+
+class BatchPull(object):
+    """
+    Pull many accounts concurrently against one shared rate-limit budget
+    """
+    def __init__(self, screen_names: List[str], workers: int = 4, rate_limiter: Optional[RateLimiter] = None,
+                 puller: Type[ETL] = ETL):
+        self.screen_names = screen_names
+        self.workers = workers
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+        self.puller = puller
+        self.state_path = os.path.join(Config.DATA_DIR, 'batch_state_{}.json'.format(Config.version))
+        self.state = {}
+        self.lock = threading.Lock()
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r') as jp:
+            return json.load(jp)
+
+    def _set_state(self, screen_name: str, **kwargs):
+        with self.lock:
+            self.state[screen_name] = kwargs
+            if not os.path.exists(Config.DATA_DIR):
+                os.makedirs(Config.DATA_DIR)
+            with open(self.state_path + '.tmp', 'w') as jp:
+                json.dump(self.state, jp, indent=2)
+            os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _pull(self, screen_name: str, resumed: bool, **kwargs) -> ETL:
+        self._set_state(screen_name, status='running')
+        api = self.puller(screen_name=screen_name, rate_limiter=self.rate_limiter)
+        if resumed:
+            # The store already holds everything from the newest tweet back to where the worker died
+            kwargs.update(incremental=True, backfill=True)
+        api.etl(**kwargs)
+        return api
+
+    def run(self, to_date: Optional[str] = None, overwrite: bool = False, incremental: bool = False,
+            backfill: bool = False, shards: int = 1, resume: bool = False) -> Dict[str, ETL]:
+        """
+        Run the pulls in a thread pool, with resume only the accounts not finished by the last batch are pulled
+        """
+        self.state = self._load_state() if resume else {}
+        done = [s for s in self.screen_names if self.state.get(s, {}).get('status') == 'done']
+        pending = [s for s in self.screen_names if s not in done]
+        logger.info('Pulling {} Accounts with {} Workers ({} already done)'.format(
+            len(pending), self.workers, len(done)))
+
+        pullers = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(
+                    self._pull,
+                    screen_name,
+                    resumed=self.state.get(screen_name, {}).get('status') in ['running', 'failed'],
+                    to_date=to_date,
+                    overwrite=overwrite,
+                    incremental=incremental,
+                    backfill=backfill,
+                    shards=shards
+                ): screen_name for screen_name in pending
+            }
+            for future in as_completed(futures):
+                screen_name = futures[future]
+                try:
+                    api = future.result()
+                    pullers[screen_name] = api
+                    self._set_state(screen_name, status='done', tweets=api.store.manifest()['count'])
+                except Exception as e:
+                    logger.info('{}: Pull failed: {}'.format(screen_name, e))
+                    self._set_state(screen_name, status='failed', error=str(e))
+                logger.info('[{}/{}] Accounts finished, {} requests and {} tweets used'.format(
+                    len([s for s in self.state.values() if s['status'] in ['done', 'failed']]),
+                    len(self.screen_names), self.rate_limiter.num_requests, self.rate_limiter.num_tweets))
+        return pullers
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict
+import pandas as pd
+
+from twitter.api.columnar import PARSED_COLUMNS
+
+
+class ParseCache(object):
+    """
+    Parsed fields per tweet id, keyed on the hash of the parser rules that produced them
+    """
+    def __init__(self, save_dir: str, version: str):
+        self.path = os.path.join(save_dir, 'parse_cache_{}.sqlite'.format(version))
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS parsed (tweet_id INTEGER NOT NULL, parser_hash TEXT NOT NULL, '
+                         'p_version TEXT NOT NULL, {}, PRIMARY KEY (tweet_id, parser_hash))'.format(
+                             ', '.join('{} TEXT'.format(column) for column in PARSED_COLUMNS)))
+
+    def evict(self, hashes: Dict[str, str]):
+        """
+        Drop entries parsed by an older version of the rules
+        """
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.executemany('DELETE FROM parsed WHERE p_version = ? AND parser_hash != ?', list(hashes.items()))
+
+    def get(self, tweet_ids: pd.Series, hashes: Dict[str, str]) -> pd.DataFrame:
+        """
+        Cached fields indexed by tweet id for the requested tweets parsed by the current rules. Only the primary key
+        range of the tweets is read, so a chunk of a streamed parse does not load the whole account's cache
+        """
+        if len(tweet_ids) == 0:
+            return pd.DataFrame(columns=['tweet_id'] + PARSED_COLUMNS, dtype=object).set_index('tweet_id')
+        with closing(sqlite3.connect(self.path)) as conn:
+            cached = pd.read_sql_query(
+                'SELECT tweet_id, {} FROM parsed WHERE tweet_id BETWEEN ? AND ? AND parser_hash IN ({})'.format(
+                    ', '.join(PARSED_COLUMNS), ', '.join('?' * len(hashes))),
+                conn,
+                params=[int(tweet_ids.min()), int(tweet_ids.max())] + list(hashes.values()),
+                dtype={column: object for column in PARSED_COLUMNS}
+            )
+        cached = cached[cached['tweet_id'].isin(tweet_ids)]
+        return cached.set_index('tweet_id')
+
+    def put(self, tweet_ids: pd.Series, p_versions: pd.Series, parser_hashes: pd.Series, fields: pd.DataFrame):
+        fields = fields[PARSED_COLUMNS].astype(object)
+        fields = fields.where(fields.notna(), None)
+        rows = zip(tweet_ids.tolist(), parser_hashes.tolist(), p_versions.tolist(), *[
+            fields[column].tolist() for column in PARSED_COLUMNS
+        ])
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.executemany('INSERT OR REPLACE INTO parsed VALUES ({})'.format(
+                ', '.join('?' * (3 + len(PARSED_COLUMNS)))), rows)
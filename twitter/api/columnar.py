@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from twitter.api.grammar import EMOJIS, STOP, PAIR, LineGrammar, grammar
+
+
+# Columns a parsed tweet can carry, in the order the per-row parser usually emits them
+PARSED_COLUMNS = [
+    'tail_no',
+    'aircraft_type',
+    'routing_no',
+    'departure',
+    'departure_time',
+    'arrival',
+    'arrival_time',
+    'layover',
+    'layover_time',
+]
+
+
+def _part_fields(rules: LineGrammar, lines: pd.Series, split: str) -> pd.DataFrame:
+    """
+    Classify the separated parts of lines into part fields with the rule set, later parts win
+    """
+    fields = rules.part_fields
+    labels = np.array([rule['field'] for rule in rules.part_rules] + [None], dtype=object)
+    parts = lines.str.split(split, expand=True).fillna('')
+    result = pd.DataFrame(index=lines.index, columns=fields, dtype=object)
+    for idx in parts.columns:
+        part = parts[idx].astype(object).str.strip()
+        # Parts repeat a lot (aircraft types, tail numbers), so each distinct part is classified once
+        orders = {value: rules.part_order(idx, value) for value in part.unique()}
+        order = part.map(orders).to_numpy().astype(int)
+        field = labels[order]
+        for column in fields:
+            is_field = field == column
+            result.loc[is_field, column] = part[is_field]
+    return result
+
+
+def parse_tweets(version: str, tweets: pd.Series) -> pd.DataFrame:
+    """
+    Parse a column of tweets at once: explode into lines, classify every line with one vectorized pass of the rule
+    set's combined pattern, then pivot the fields back to one row per tweet. Matches Parser._parse_tweet row for row
+    """
+    rules = grammar(version)
+    result = pd.DataFrame(index=pd.RangeIndex(len(tweets)), columns=PARSED_COLUMNS, dtype=object)
+    if rules.pattern is None or len(tweets) == 0:
+        return result.set_index(tweets.index)
+
+    lines = tweets.reset_index(drop=True).astype(object).str.split('\n').explode()
+    lines = pd.DataFrame({
+        'tid': lines.index,
+        'ldx': lines.groupby(level=0).cumcount().values,
+        'line': lines.str.replace(EMOJIS, '', regex=True).str.strip().values,
+    }).astype({'line': object})
+
+    # The alternation tries the line rules in order, so only the group of the first matching rule is set
+    matched = lines['line'].str.extract(rules.pattern)
+    stops, pairs, parts = [], [], []
+    for kind, (role, groups, split) in rules.line_rules.items():
+        is_kind = matched[kind].notna()
+        if role == STOP:
+            stops.append(lines.loc[is_kind, ['tid', 'ldx']].assign(
+                code=matched.loc[is_kind, groups[0]].str.strip(), time=matched.loc[is_kind, groups[1]].str.strip()))
+        elif role == PAIR:
+            pairs.append(lines.loc[is_kind, ['tid', 'ldx']].assign(
+                old_0=matched.loc[is_kind, groups[0]].str.strip(), old_1=matched.loc[is_kind, groups[1]].str.strip()))
+        else:
+            parts.append(_part_fields(rules, lines.loc[is_kind, 'line'], split).assign(
+                tid=lines.loc[is_kind, 'tid'], ldx=lines.loc[is_kind, 'ldx']))
+    stops = pd.concat(stops) if len(stops) > 0 else pd.DataFrame(columns=['tid', 'ldx', 'code', 'time'])
+    pairs = pd.concat(pairs) if len(pairs) > 0 else pd.DataFrame(columns=['tid', 'ldx', 'old_0', 'old_1'])
+
+    # Departure is the first airport line, arrival the last, with a layover if they are three lines apart. Only line
+    # numbers 0-9 count as airport lines
+    stops = stops.sort_values(['tid', 'ldx'])
+    stops = stops[stops['ldx'] < 10]
+    first = stops.drop_duplicates('tid', keep='first').set_index('tid')
+    last = stops.drop_duplicates('tid', keep='last').set_index('tid')
+    result.loc[first.index, 'departure'] = first['code'].values
+    result.loc[first.index, 'departure_time'] = first['time'].values
+    result.loc[last.index, 'arrival'] = last['code'].values
+    result.loc[last.index, 'arrival_time'] = last['time'].values
+    layovers = last[last['ldx'] - first['ldx'] == 3]
+    layovers = stops.set_index(['tid', 'ldx']).reindex(list(zip(layovers.index, layovers['ldx'] - 1))).dropna()
+    result.loc[layovers.index.get_level_values('tid'), 'layover'] = layovers['code'].values
+    result.loc[layovers.index.get_level_values('tid'), 'layover_time'] = layovers['time'].values
+
+    # The old two airport format only applies to tweets without airport lines, the last such line wins
+    olds = pairs.sort_values(['tid', 'ldx'])
+    olds = olds[~olds['tid'].isin(first.index)].drop_duplicates('tid', keep='last').set_index('tid')
+    result.loc[olds.index, 'departure'] = olds['old_0'].values
+    result.loc[olds.index, 'arrival'] = olds['old_1'].values
+
+    # The last aircraft line wins outright, including its empty fields
+    if len(parts) > 0:
+        aircraft = pd.concat(parts).sort_values(['tid', 'ldx']).drop_duplicates('tid', keep='last').set_index('tid')
+        for column in rules.part_fields:
+            result.loc[aircraft.index, column] = aircraft[column].values
+
+    return result.set_index(tweets.index)
@@ -1,92 +1,203 @@
+import io
 import os
 import pandas as pd
-
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any
 
 from twitter.api.parser import Parser
+from twitter.api.instrument import instrumented
+from twitter.api.lookup import validate
+from twitter.api.aggregates import FlightAggregates
 from twitter.config import logger
 
 
+PARSE_COLUMNS = ['parsed', 'parsed_w_routing_no']
+# Dimension, plot title, y label and which end of the ascending counts to keep. Airports and aircraft types are the
+# validated codes so variants of a code count together
+DIMENSIONS = [
+    ('team_name', 'Top 50 Team Mentions in {}', 'Team Name', 'tail'),
+    ('departure_iata', 'Top 50 Departures in {}', 'Departure Airport', 'tail'),
+    ('arrival_iata', 'Top 50 Arrivals in {}', 'Arrival Airport', 'tail'),
+    ('aircraft_type_icao', 'Top 50 Aircraft Types in {}', 'Aircraft Type', 'head'),
+]
+TABLE_FORMATS = ['parquet', 'json']
+
+
+def aggregate(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Every count table the plots need in one groupby each: tweets per day by parse flag, and distinct tweets per
+    year / dimension / value
+    """
+    series = df[['tweet_date', 'tweet'] + PARSE_COLUMNS].melt(
+        id_vars=['tweet_date', 'tweet'], var_name='parse_col', value_name='value')
+    series = series.groupby(['parse_col', 'value', 'tweet_date']).agg(num_tweets=('tweet', 'nunique')).reset_index()
+
+    dimensions = [dimension for dimension, _, _, _ in DIMENSIONS]
+    counts = df[['year', 'created_at'] + dimensions].astype({dimension: object for dimension in dimensions}).melt(
+        id_vars=['year', 'created_at'], var_name='dimension', value_name='value')
+    counts = counts.groupby(['dimension', 'year', 'value']).agg(tweet=('created_at', 'nunique')).reset_index()
+    return {'series': series, 'counts': counts}
+
+
+def rolled_up(aggregates: FlightAggregates, screen_name: str) -> Dict[str, pd.DataFrame]:
+    """
+    The count tables of aggregate() rolled up from the materialized daily counts rather than the parsed tweets.
+    These count tweets, where aggregate() counts distinct tweet texts and timestamps
+    """
+    frames = []
+    for parse_col in PARSE_COLUMNS:
+        df_ = aggregates.rollup([parse_col], grain='day', screen_names=[screen_name])
+        frames.append(pd.DataFrame({'parse_col': parse_col, 'value': df_[parse_col],
+                                    'tweet_date': df_['period'].dt.date, 'num_tweets': df_['tweets']}))
+    series = pd.concat(frames, ignore_index=True)
+
+    frames = []
+    for dimension, _, _, _ in DIMENSIONS:
+        df_ = aggregates.rollup([dimension], grain='year', screen_names=[screen_name]).dropna(subset=[dimension])
+        frames.append(pd.DataFrame({'dimension': dimension, 'year': df_['period'].dt.year, 'value': df_[dimension],
+                                    'tweet': df_['tweets']}))
+    counts = pd.concat(frames, ignore_index=True)
+    return {'series': series, 'counts': counts}
+
+
+def _pages(tables: Dict[str, pd.DataFrame], years: List[int]) -> List[Dict[str, Any]]:
+    """
+    One spec per diagnostics page, in the order they go in the pdf
+    """
+    pages = []
+    for parse_col in PARSE_COLUMNS:
+        df_ = tables['series'][tables['series']['parse_col'] == parse_col]
+        pages.append({
+            'kind': 'series',
+            'title': 'Tweets over Time: {}'.format(parse_col),
+            'lines': [
+                ('Parsed: {}'.format(parsed), df_plot.sort_values('tweet_date').reset_index(drop=True))
+                for parsed, df_plot in df_.groupby('value')
+            ]
+        })
+    counts = tables['counts']
+    for year in years:
+        for dimension, title, ylabel, end in DIMENSIONS:
+            df_plot = counts[(counts['year'] == year) & (counts['dimension'] == dimension)]
+            df_plot = df_plot.sort_values('tweet', ascending=True).reset_index()
+            pages.append({
+                'kind': 'bars',
+                'title': title.format(year),
+                'ylabel': ylabel,
+                'bars': df_plot.tail(50) if end == 'tail' else df_plot.head(50)
+            })
+    return pages
+
+
+def _figure(page: Dict[str, Any], figsize: tuple):
+    # matplotlib is only imported once there is something to draw
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_title(page['title'])
+    if page['kind'] == 'series':
+        for label, df_plot in page['lines']:
+            ax.plot(df_plot['tweet_date'], df_plot['num_tweets'], label=label, marker='o', alpha=0.5)
+        ax.grid(True)
+        ax.legend()
+        ax.set_ylabel('Number of Tweets')
+        ax.set_xlabel('Date')
+    else:
+        ax.barh(page['bars']['value'], page['bars']['tweet'])
+        ax.tick_params(axis='x', labelrotation=90)
+        ax.grid(True)
+        ax.set_ylabel(page['ylabel'])
+        ax.set_xlabel('Num tweets')
+    return fig
+
+
+def _render_page(job: tuple) -> bytes:
+    """
+    Render a page to pdf bytes in a worker process
+    """
+    page, figsize = job
+    buffer = io.BytesIO()
+    _figure(page, figsize).savefig(buffer, format='pdf')
+    return buffer.getvalue()
+
+
 class Diagnostics(Parser):
     """
     Create some quick plots
     """
-    def diagnostics(self, df: pd.DataFrame):
+    diagnostic_columns = ['created_at', 'tweet_date', 'tweet', 'team_name', 'flightware_link', 'departure', 'arrival',
+                          'aircraft_type', 'parsed', 'parsed_w_routing_no']
+
+    def save_aggregates(self, tables: Dict[str, pd.DataFrame], formats: List[str]):
+        """
+        Write the diagnostics count tables, e.g. diagnostics_counts_v1.parquet
+        """
+        for fmt in formats:
+            if fmt not in TABLE_FORMATS:
+                raise ValueError('Unknown table format {}, expected one of {}'.format(fmt, TABLE_FORMATS))
+            for name, table in tables.items():
+                path = os.path.join(self.save_dir, 'diagnostics_{}_{}.{}'.format(name, self.version, fmt))
+                logger.info('Saving Diagnostics Table to {}'.format(path))
+                if fmt == 'parquet':
+                    table.to_parquet(path, engine='pyarrow', index=False)
+                else:
+                    table.to_json(path, orient='records', date_format='iso')
+
+    @instrumented('diagnostics')
+    def diagnostics(self, df: Optional[pd.DataFrame] = None, workers: int = 1, plot: bool = True,
+                    table_formats: Optional[List[str]] = None,
+                    from_aggregates: bool = False) -> Dict[str, pd.DataFrame]:
         """
-        Quick plots of the results
+        Quick plots of the results, loading only the needed columns of the saved parsed tweets if no frame is given.
+        With workers > 1 pages are rendered across a process pool and merged, table_formats also writes the count
+        tables, and plot=False skips the pdf. from_aggregates reads the counts from the materialized daily counts
+        instead of the parsed tweets
         """
-        df['year'] = df['created_at'].dt.year
-        df = df[(df['team_name'] != 'None') & (df['flightware_link'] != 'None')]
-
-        logger.info('Diagnostics for Parsing')
-        with PdfPages(os.path.join(self.save_dir, 'diagnostics.pdf')) as pdf:
-            # Time series of tweets
-            for parse_col in ['parsed', 'parsed_w_routing_no']:
-                plt.figure(figsize=self.figsize)
-                plt.title('Tweets over Time: {}'.format(parse_col))
-                for parsed, df_plot in df.groupby(parse_col):
-                    df_plot = df_plot.groupby('tweet_date').agg(num_tweets=('tweet', 'nunique')).reset_index()
-                    df_plot = df_plot.sort_values('tweet_date').reset_index(drop=True)
-                    plt.plot(
-                        df_plot['tweet_date'],
-                        df_plot['num_tweets'],
-                        label='Parsed: {}'.format(parsed),
-                        marker='o',
-                        alpha=0.5
-                    )
-                plt.grid(True)
-                plt.legend()
-                plt.ylabel('Number of Tweets')
-                plt.xlabel('Date')
-                pdf.savefig()
-                plt.close()
-
-            for year, df_ in df.groupby('year'):
-                df_plot = df_.groupby('team_name').agg(tweet=('created_at', 'nunique')).reset_index()
-                df_plot = df_plot.sort_values('tweet', ascending=True).reset_index().tail(50)
-                plt.figure(figsize=self.figsize)
-                plt.barh(df_plot['team_name'], df_plot['tweet'])
-                plt.xticks(rotation=90)
-                plt.grid(True)
-                plt.title('Top 50 Team Mentions in {}'.format(year))
-                plt.ylabel('Team Name')
-                plt.xlabel('Num tweets')
-                pdf.savefig()
-                plt.close()
-
-                df_plot = df_.groupby('departure').agg(tweet=('created_at', 'nunique')).reset_index()
-                df_plot = df_plot.sort_values('tweet', ascending=True).reset_index().tail(50)
-                plt.figure(figsize=self.figsize)
-                plt.barh(df_plot['departure'], df_plot['tweet'])
-                plt.xticks(rotation=90)
-                plt.grid(True)
-                plt.title('Top 50 Departures in {}'.format(year))
-                plt.ylabel('Departure Airport')
-                plt.xlabel('Num tweets')
-                pdf.savefig()
-                plt.close()
-
-                df_plot = df_.groupby('arrival').agg(tweet=('created_at', 'nunique')).reset_index()
-                df_plot = df_plot.sort_values('tweet', ascending=True).reset_index().tail(50)
-                plt.figure(figsize=self.figsize)
-                plt.barh(df_plot['arrival'], df_plot['tweet'])
-                plt.xticks(rotation=90)
-                plt.grid(True)
-                plt.title('Top 50 Arrivals in {}'.format(year))
-                plt.ylabel('Arrival Airport')
-                plt.xlabel('Num tweets')
-                pdf.savefig()
-                plt.close()
-
-                df_plot = df_.groupby('aircraft_type').agg(tweet=('created_at', 'nunique')).reset_index()
-                df_plot = df_plot.sort_values('tweet', ascending=True).reset_index().head(50)
-                plt.figure(figsize=self.figsize)
-                plt.barh(df_plot['aircraft_type'], df_plot['tweet'])
-                plt.xticks(rotation=90)
-                plt.grid(True)
-                plt.title('Top 50 Aircraft Types in {}'.format(year))
-                plt.ylabel('Aircraft Type')
-                plt.xlabel('Num tweets')
-                pdf.savefig()
-                plt.close()
+        if from_aggregates:
+            logger.info('Diagnostics for Parsing from Aggregates')
+            with self.report.stage('aggregate'):
+                tables = rolled_up(FlightAggregates(version=self.version), self.screen_name)
+            years = sorted(tables['counts']['year'].unique())
+        else:
+            if df is None:
+                df = self.load_parsed(columns=self.diagnostic_columns)
+            # Tweets parsed before the reference lookup only have the raw codes
+            df = validate(df)
+            df['year'] = df['created_at'].dt.year
+            df = df[(df['team_name'] != 'None') & (df['flightware_link'] != 'None')]
+
+            logger.info('Diagnostics for Parsing')
+            self.report.items(df.shape[0])
+            with self.report.stage('aggregate'):
+                tables = aggregate(df)
+            years = sorted(df['year'].dropna().unique())
+        if table_formats is not None:
+            self.save_aggregates(tables, table_formats)
+        if not plot:
+            return tables
+
+        with self.report.stage('render'):
+            pages = _pages(tables, years)
+            self.report.items(len(pages))
+            path = os.path.join(self.save_dir, 'diagnostics.pdf')
+            if workers > 1:
+                from pypdf import PdfWriter
+
+                logger.info('Rendering {} Pages with {} Workers'.format(len(pages), workers))
+                writer = PdfWriter()
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    jobs = [(page, self.figsize) for page in pages]
+                    for rendered in executor.map(_render_page, jobs, chunksize=max(1, len(jobs) // (4 * workers))):
+                        writer.append(io.BytesIO(rendered))
+                with open(path, 'wb') as fp:
+                    writer.write(fp)
+            else:
+                from matplotlib.backends.backend_pdf import PdfPages
+
+                with PdfPages(path) as pdf:
+                    for page in pages:
+                        pdf.savefig(_figure(page, self.figsize))
+        return tables
@@ -1,12 +1,18 @@
 import os
-import json
-import tweepy
+import shutil
 import datetime
+import threading
 import pandas as pd
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional
 
 
 from twitter.config import Config, logger
+from twitter.api.store import RawStore
+from twitter.api.records import compact, created_at_epochs
+from twitter.api.ratelimit import RateLimiter, backoff
+from twitter.api.instrument import RunReport, instrumented
+from twitter.api.formats import write_parsed, read_parsed
 
 
 class ETL(object):
@@ -17,75 +23,295 @@ class ETL(object):
     twitter_dev_env = 'marcus'
     min_date = pd.Timestamp('2017-01-01')
     max_tweets = 100000
+    raw_compress = False
+    raw_chunk_bytes = 64 * 1024 ** 2
+    # Keep the full status json in the raw store, otherwise only the fields the parser uses
+    raw_json = True
+    # Retries on rate limit responses, the wait doubling from api_backoff seconds
+    api_retries = 5
+    api_backoff = 60.
+    output_formats = ['csv', 'parquet']
     figsize = (12, 12)
 
-    def __init__(self, screen_name: str):
+    def __init__(self, screen_name: str, rate_limiter: Optional[RateLimiter] = None, api: Optional[Any] = None):
         self.screen_name = screen_name
-        try:
-            auth = tweepy.OAuthHandler(os.environ.get('consumer_key', 'none'), os.environ.get('consumer_secret', 'none'))
-            auth.set_access_token(os.environ.get('access_token_key', 'none'), os.environ.get('access_token_secret', 'none'))
-            self.api = tweepy.API(auth)
-            if not self.api.verify_credentials():
-                logger.info('Could not Validate Credentials')
-        except:
-            logger.info('API Connect failed')
-            self.api = None
+        self.rate_limiter = rate_limiter
+        self.report = RunReport(screen_name)
+        # An already connected client, or a local stand-in such as benchmarks.mock_archive.MockArchive. Otherwise
+        # the api is only connected once a pull needs it
+        self._api = api
+        # Shard threads share the lazy connect
+        self._api_lock = threading.Lock()
 
         self.save_dir = os.path.join(Config.DATA_DIR, self.screen_name)
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
+        self.store = RawStore(self.save_dir, self.version, compress=self.raw_compress, chunk_bytes=self.raw_chunk_bytes)
 
-    def etl(self, to_date: Optional[str] = None, overwrite: bool = False) -> List[Dict]:
+    @property
+    def api(self):
         """
-        Pull tweets, save raw, and pull json
+        tweepy API, connected and verified on first use so runs served from the raw cache never touch the network
         """
-        if os.path.exists(os.path.join(self.save_dir, 'raw_tweets_{}.json'.format(self.version))) and not overwrite:
-            logger.info('Loading Raw Tweets from Cache')
-            with open(os.path.join(self.save_dir, 'raw_tweets_{}.json'.format(self.version)), 'r') as jp:
-                tweets = json.load(jp)
-            return tweets
+        with self._api_lock:
+            if self._api is None:
+                import tweepy
 
-        logger.info('Pulling Tweets for {}'.format(self.screen_name))
-        tweets = []
-        to_date = pd.Timestamp(datetime.datetime.now()) if to_date is None else pd.Timestamp(to_date)
-        while to_date > self.min_date and len(tweets) < self.max_tweets:
-            # Iterate over 500 tweet batches
-            tweet_times = []
-            for status in tweepy.Cursor(
-                    self.api.search_full_archive,
-                    label=self.twitter_dev_env,
-                    query='from:{}'.format(self.screen_name),
-                    toDate=to_date.strftime('%Y%m%d%H%M'),
-                    # fromDate=self.min_date.strftime('%Y%m%d%H%M'),
-                    maxResults=500
-            ).items():
-                tweets.append(status._json)
-                tweet_times.append(pd.Timestamp(status._json['created_at']).tz_localize(None))
+                try:
+                    auth = tweepy.OAuthHandler(os.environ.get('consumer_key', 'none'),
+                                               os.environ.get('consumer_secret', 'none'))
+                    auth.set_access_token(os.environ.get('access_token_key', 'none'),
+                                          os.environ.get('access_token_secret', 'none'))
+                    api = tweepy.API(auth)
+                    if not api.verify_credentials():
+                        logger.info('Could not Validate Credentials')
+                    self._api = api
+                except:
+                    logger.info('API Connect failed')
+                    self._api = None
+            return self._api
+
+    @property
+    def search(self):
+        """
+        search_full_archive counted in the run report, throttled by the shared rate limiter when there is one and
+        retried with backoff on rate limit responses
+        """
+        search = self.report.counted('api_calls', self.api.search_full_archive)
+        if self.rate_limiter is not None:
+            search = self.rate_limiter.wrap(search)
+        return backoff(search, retries=self.api_retries, wait=self.api_backoff,
+                       on_retry=lambda: self.report.count('api_retries'))
+
+    def _pages(self, next_token: Optional[Any] = None, **kwargs) -> Iterator:
+        """
+        search_full_archive pages for this account, picking up at next_token when resuming
+        """
+        import tweepy
+
+        if next_token is not None:
+            kwargs['next'] = next_token
+        return tweepy.Cursor(
+            self.search,
+            label=self.twitter_dev_env,
+            query='from:{}'.format(self.screen_name),
+            maxResults=500,
+            **kwargs
+        ).pages()
+
+    def _append_page(self, page: List[Dict[str, Any]], store: Optional[RawStore] = None,
+                     checkpoint: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Append a page of statuses not already in the store together with the cursor position to resume from, the store
+        drops any its id index already has
+        """
+        store = self.store if store is None else store
+        page = [tweet if self.raw_json else compact(tweet) for tweet in page]
+        if store is self.store:
+            self.report.items(len(page))
+        store.append(page, checkpoint=checkpoint)
+        return page
+
+    def _walk_back(self, to_date: pd.Timestamp, next_token: Optional[Any] = None,
+                   num_tweets: int = 0, oldest: Optional[str] = None) -> int:
+        """
+        Walk search_full_archive back from to_date to min_date in 30 day windows, checkpointing every page. A resumed
+        walk starts at next_token in the to_date window, oldest being the oldest tweet already seen in it
+        """
+        while to_date > self.min_date and num_tweets < self.max_tweets:
+            # Iterate over 500 tweet batches, appending each page to the store as it arrives
+            tweet_times = [] if oldest is None else [pd.Timestamp(oldest).value]
+            pages = self._pages(
+                next_token,
+                toDate=to_date.strftime('%Y%m%d%H%M'),
+                # fromDate=self.min_date.strftime('%Y%m%d%H%M'),
+            )
+            for page in pages:
+                page = [status._json for status in page]
+                if len(page) > 0:
+                    tweet_times.append(created_at_epochs([tweet['created_at'] for tweet in page]).min())
+                page = self.store.unseen(page)
+                num_tweets += len(page)
+                self._append_page(page, checkpoint={
+                    'stage': 'walk_back',
+                    'to_date': to_date.isoformat(),
+                    'next': pages.next_token,
+                    'num_tweets': num_tweets,
+                    'oldest': pd.Timestamp(min(tweet_times)).isoformat() if len(tweet_times) > 0 else None
+                })
+            next_token, oldest = None, None
             if len(tweet_times) == 0:
                 to_date = to_date - pd.Timedelta(days=30)
-                logger.info('No tweets from {} to {}'.format(to_date + pd.Timedelta(days=30), to_date))
+                logger.info('{}: No tweets from {} to {}'.format(
+                    self.screen_name, to_date + pd.Timedelta(days=30), to_date))
             else:
-                to_date = min(tweet_times)
-            logger.info('{} Total Tweets back to {}'.format(len(tweets), to_date))
+                to_date = pd.Timestamp(min(tweet_times))
+            self.store.set_checkpoint({'stage': 'walk_back', 'to_date': to_date.isoformat(), 'next': None,
+                                       'num_tweets': num_tweets, 'oldest': None})
+            logger.info('{}: {} Total Tweets back to {}'.format(self.screen_name, num_tweets, to_date))
+        self.store.set_checkpoint(None)
+        return num_tweets
 
-        # If you set a limit and the old data exists, then append them together
-        if to_date is not None and \
-                os.path.exists(os.path.join(self.save_dir, 'raw_tweets_{}.json'.format(self.version))):
-            logger.info('Appending Old Tweets to New')
-            with open(os.path.join(self.save_dir, 'raw_tweets_{}.json'.format(self.version)), 'r') as jp:
-                old_tweets = json.load(jp)
-            tweets.extend(old_tweets)
-        logger.info('Saving Raw Tweets')
-        with open(os.path.join(self.save_dir, 'raw_tweets_{}.json'.format(self.version)), 'w') as jp:
-            json.dump(tweets, jp)
-        return tweets
+    def _pull_window(self, from_date: pd.Timestamp, to_date: pd.Timestamp, store: Optional[RawStore] = None,
+                     next_token: Optional[Any] = None, num_tweets: int = 0) -> int:
+        """
+        Pull every tweet between from_date and to_date, the cursor pages through the whole window checkpointing every
+        page, a resumed window starts at next_token
+        """
+        store = self.store if store is None else store
+        pages = self._pages(next_token, fromDate=from_date.strftime('%Y%m%d%H%M'),
+                            toDate=to_date.strftime('%Y%m%d%H%M'))
+        for page in pages:
+            page = store.unseen([status._json for status in page])
+            num_tweets += len(page)
+            self._append_page(page, store, checkpoint={
+                'stage': 'window',
+                'from_date': from_date.isoformat(),
+                'to_date': to_date.isoformat(),
+                'next': pages.next_token,
+                'num_tweets': num_tweets
+            })
+            if num_tweets >= self.max_tweets:
+                break
+        store.set_checkpoint(None)
+        logger.info('{}: {} New Tweets from {} to {}'.format(self.screen_name, num_tweets, from_date, to_date))
+        return num_tweets
 
-    def save_parsed(self, df: pd.DataFrame):
+    def _pull_sharded(self, from_date: pd.Timestamp, to_date: pd.Timestamp, shards: int, resume: bool = False) -> int:
         """
-        Save parsed tweets
+        Split from_date -> to_date into independent windows, pull them in parallel into scratch stores, then merge
+        them into the raw store deduped on tweet id. A resumed pull skips finished windows and picks the others up
+        from their own checkpoints
+        """
+        shard_dir = os.path.join(self.save_dir, 'shards')
+        if os.path.exists(shard_dir) and not resume:
+            shutil.rmtree(shard_dir)
+        self.store.set_checkpoint({'stage': 'sharded', 'from_date': from_date.isoformat(),
+                                   'to_date': to_date.isoformat(), 'shards': shards})
+        bounds = pd.date_range(from_date, to_date, periods=shards + 1)
+        stores = [
+            RawStore(os.path.join(shard_dir, 'shard-{:03d}'.format(idx)), self.version, compress=self.raw_compress,
+                     chunk_bytes=self.raw_chunk_bytes) for idx in range(shards)
+        ]
+
+        def pull(idx: int) -> int:
+            store = stores[idx]
+            if not os.path.exists(store.manifest_path):
+                return self._pull_window(bounds[idx], bounds[idx + 1], store)
+            store.repair()
+            checkpoint = store.checkpoint()
+            if checkpoint is None:
+                # Finished before the restart
+                return 0
+            return self._pull_window(bounds[idx], bounds[idx + 1], store, checkpoint['next'], checkpoint['num_tweets'])
+
+        logger.info('{}: Pulling {} Windows from {} to {}'.format(self.screen_name, shards, from_date, to_date))
+        with ThreadPoolExecutor(max_workers=shards) as executor:
+            list(executor.map(pull, range(shards)))
+
+        # Merge newest window first, the same order a sequential walk back would have appended them in
+        num_tweets = 0
+        for store in reversed(stores):
+            page = []
+            for tweet in store.read():
+                page.append(tweet)
+                if len(page) == 500:
+                    num_tweets += len(self._append_page(self.store.unseen(page)))
+                    page = []
+            num_tweets += len(self._append_page(self.store.unseen(page)))
+        shutil.rmtree(shard_dir)
+        self.store.set_checkpoint(None)
+        return num_tweets
+
+    def _resume(self, checkpoint: Dict[str, Any]) -> int:
+        """
+        Finish the pull a previous run was killed in the middle of
+        """
+        logger.info('{}: Resuming {} pull from checkpoint {}'.format(self.screen_name, checkpoint['stage'], checkpoint))
+        if checkpoint['stage'] == 'walk_back':
+            return self._walk_back(pd.Timestamp(checkpoint['to_date']), checkpoint['next'],
+                                   checkpoint['num_tweets'], checkpoint['oldest'])
+        if checkpoint['stage'] == 'window':
+            return self._pull_window(pd.Timestamp(checkpoint['from_date']), pd.Timestamp(checkpoint['to_date']),
+                                     next_token=checkpoint['next'], num_tweets=checkpoint['num_tweets'])
+        if checkpoint['stage'] == 'sharded':
+            return self._pull_sharded(pd.Timestamp(checkpoint['from_date']), pd.Timestamp(checkpoint['to_date']),
+                                      checkpoint['shards'], resume=True)
+        raise ValueError('Unknown checkpoint stage {}'.format(checkpoint['stage']))
+
+    def raw_tweets(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the stored raw tweets without pulling, converting a legacy cache and dropping a half written status first
+        """
+        self.store.migrate()
+        self.store.repair()
+        return self.store.read()
+
+    @instrumented('etl')
+    def etl(self, to_date: Optional[str] = None, overwrite: bool = False, incremental: bool = False,
+            backfill: bool = False, shards: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Pull tweets page by page into the raw store, then stream them back
+
+        incremental only asks for tweets newer than the newest stored one, and with backfill also for tweets older
+        than the oldest stored one. With shards > 1 the walk back to min_date is split into parallel date windows
+        """
+        self.store.migrate()
+        self.store.repair()
+        checkpoint = None if overwrite else self.store.checkpoint()
+        if checkpoint is not None:
+            self._resume(checkpoint)
+        if self.store.exists() and not (overwrite or incremental):
+            logger.info('Loading Raw Tweets from Cache')
+            return self.store.read()
+
+        to_date = pd.Timestamp(datetime.datetime.now()) if to_date is None else pd.Timestamp(to_date)
+        newest, oldest = self.store.newest(), self.store.oldest()
+        if incremental and newest is not None:
+            logger.info('Pulling Tweets for {} newer than {}'.format(self.screen_name, newest))
+            self._pull_window(pd.Timestamp(newest), to_date)
+            if backfill:
+                logger.info('Backfilling Tweets for {} older than {}'.format(self.screen_name, oldest))
+                if shards > 1:
+                    self._pull_sharded(self.min_date, pd.Timestamp(oldest), shards)
+                else:
+                    self._walk_back(pd.Timestamp(oldest))
+        else:
+            logger.info('Pulling Tweets for {}'.format(self.screen_name))
+            if shards > 1:
+                self._pull_sharded(self.min_date, to_date, shards)
+            else:
+                self._walk_back(to_date)
+        logger.info('{}: {} Tweets in Store'.format(self.screen_name, self.store.manifest()['count']))
+
+        return self.store.read()
+
+    @instrumented('save')
+    def save_parsed(self, df: pd.DataFrame, formats: Optional[List[str]] = None):
+        """
+        Save parsed tweets, csv and partitioned parquet by default. xlsx is opt-in since it is slow for big accounts
         """
         logger.info('Saving Parsed Tweets')
         df = df.sort_values('created_at')
-        df.to_csv(os.path.join(self.save_dir, 'parsed_tweets_{}.csv'.format(self.version)), index=False)
-        df.to_excel(os.path.join(self.save_dir, 'parsed_tweets_{}.xlsx'.format(self.version)), index=False)
+        self.report.items(df.shape[0])
+        for fmt in self.output_formats if formats is None else formats:
+            with self.report.stage('save_{}'.format(fmt)):
+                write_parsed(df, self.save_dir, self.version, [fmt])
+                self.report.items(df.shape[0])
 
+    def save_report(self, command: Optional[str] = None) -> str:
+        """
+        Write the run report to run_report_{version}.json, or run_report_{command}_{version}.json for a single stage
+        """
+        name = self.version if command is None else '{}_{}'.format(command, self.version)
+        path = os.path.join(self.save_dir, 'run_report_{}.json'.format(name))
+        logger.info('Saving Run Report to {}'.format(path))
+        self.report.save(path)
+        return path
+
+    def load_parsed(self, columns: Optional[List[str]] = None, fmt: Optional[str] = None,
+                    filters: Optional[List] = None) -> pd.DataFrame:
+        """
+        Load saved parsed tweets, only reading the columns asked for
+        """
+        return read_parsed(self.save_dir, self.version, columns=columns, fmt=fmt, filters=filters)
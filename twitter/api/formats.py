@@ -0,0 +1,183 @@
+import os
+import shutil
+from typing import List, Optional, Iterable
+import pandas as pd
+
+from twitter.config import logger
+
+
+# Leading columns of the parsed tweets, the parsed fields follow
+RECORD_COLUMNS = [
+    'tweet_id', 'created_at', 'tweet_date', 'tweet', 'user_mention', 'team_name', 'flightware_link', 'p_version'
+]
+# Low-cardinality columns stored dictionary encoded
+CATEGORICAL_COLUMNS = ['team_name', 'departure', 'arrival', 'aircraft_type', 'departure_iata', 'arrival_iata',
+                       'aircraft_type_icao']
+FORMATS = ['csv', 'parquet', 'feather', 'xlsx']
+# Formats that can be written a chunk at a time
+STREAM_FORMATS = ['csv', 'parquet', 'feather']
+
+
+def parsed_path(save_dir: str, version: str, fmt: str) -> str:
+    if fmt == 'parquet':
+        # Partitioned dataset directory
+        return os.path.join(save_dir, 'parsed_tweets_{}'.format(version))
+    return os.path.join(save_dir, 'parsed_tweets_{}.{}'.format(version, fmt))
+
+
+def typed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Proper dtypes for the columnar formats: datetimes, categoricals for the grouping columns and nullable strings
+    """
+    df = df.copy()
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    df['tweet_date'] = pd.to_datetime(df['tweet_date'])
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].notna(), None)
+    return df
+
+
+def write_parsed(df: pd.DataFrame, save_dir: str, version: str, formats: Iterable[str]):
+    """
+    Write parsed tweets in each requested format
+    """
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError('Unknown output format {}, expected one of {}'.format(fmt, FORMATS))
+        path = parsed_path(save_dir, version, fmt)
+        logger.info('Saving Parsed Tweets to {}'.format(path))
+        if fmt == 'csv':
+            df.to_csv(path, index=False)
+        elif fmt == 'xlsx':
+            df.to_excel(path, index=False)
+        elif fmt == 'feather':
+            typed(df).reset_index(drop=True).to_feather(path)
+        elif fmt == 'parquet':
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            df_ = typed(df)
+            df_ = df_.assign(year=df_['created_at'].dt.year)
+            if df_.shape[0] == 0:
+                # Partitioning writes no files for no rows, keep an empty dataset so the output still loads
+                os.makedirs(path)
+                df_.to_parquet(os.path.join(path, 'part-0.parquet'), engine='pyarrow', index=False)
+            else:
+                df_.to_parquet(path, engine='pyarrow', partition_cols=['year', 'p_version'], index=False)
+
+
+class ParsedWriter(object):
+    """
+    Write parsed tweets a chunk at a time: csv rows are appended, each chunk is a row group of the feather file and a
+    file per partition of the parquet dataset. Everything goes to temporary paths that replace the old output on close
+    """
+    def __init__(self, save_dir: str, version: str, formats: Iterable[str]):
+        self.paths = {}
+        for fmt in formats:
+            if fmt not in STREAM_FORMATS:
+                raise ValueError('Cannot stream output format {}, expected one of {}'.format(fmt, STREAM_FORMATS))
+            self.paths[fmt] = parsed_path(save_dir, version, fmt)
+        self.schema = None
+        self.categories = {}
+        self.num_chunks = 0
+        self._feather = None
+
+    @staticmethod
+    def _tmp(path: str) -> str:
+        return path + '.tmp'
+
+    def _table(self, df: pd.DataFrame):
+        import pyarrow as pa
+
+        df = typed(df)
+        df = df.assign(year=df['created_at'].dt.year)
+        # Categories only ever grow, so each chunk's dictionary extends the last one as the feather file requires
+        for column in CATEGORICAL_COLUMNS:
+            categories = self.categories.get(column, [])
+            known = set(categories)
+            categories = categories + [c for c in df[column].cat.categories if c not in known]
+            df[column] = df[column].cat.set_categories(categories)
+            self.categories[column] = categories
+        if self.schema is None:
+            # Columns that are all missing in the first chunk are still strings
+            fields = []
+            for field in pa.Schema.from_pandas(df, preserve_index=False):
+                if pa.types.is_dictionary(field.type):
+                    field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+                elif pa.types.is_null(field.type):
+                    field = field.with_type(pa.string())
+                fields.append(field)
+            self.schema = pa.schema(fields)
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+    def write(self, df: pd.DataFrame):
+        """
+        Append a chunk of parsed tweets to every output
+        """
+        table = self._table(df) if 'parquet' in self.paths or 'feather' in self.paths else None
+        for fmt, path in self.paths.items():
+            if fmt == 'csv':
+                df.to_csv(self._tmp(path), index=False, header=self.num_chunks == 0,
+                          mode='w' if self.num_chunks == 0 else 'a')
+            elif fmt == 'feather':
+                import pyarrow as pa
+
+                if self._feather is None:
+                    self._feather = pa.ipc.new_file(self._tmp(path), table.drop(['year']).schema,
+                                                   options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+                self._feather.write_table(table.drop(['year']))
+            elif fmt == 'parquet':
+                import pyarrow.parquet as pq
+
+                if self.num_chunks == 0 and os.path.exists(self._tmp(path)):
+                    shutil.rmtree(self._tmp(path))
+                pq.write_to_dataset(table, self._tmp(path), partition_cols=['year', 'p_version'],
+                                    basename_template='chunk-{:05d}-{{i}}.parquet'.format(self.num_chunks))
+        self.num_chunks += 1
+
+    def close(self):
+        """
+        Move the finished outputs into place
+        """
+        if self._feather is not None:
+            self._feather.close()
+        for fmt, path in self.paths.items():
+            if fmt == 'parquet' and not os.path.exists(self._tmp(path)):
+                # Nothing was written, keep an empty dataset so the output still loads
+                import pyarrow.parquet as pq
+
+                os.makedirs(self._tmp(path))
+                pq.write_table(self.schema.empty_table(), os.path.join(self._tmp(path), 'chunk-00000-0.parquet'))
+            logger.info('Saving Parsed Tweets to {}'.format(path))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(self._tmp(path), path)
+
+
+def read_parsed(save_dir: str, version: str, columns: Optional[List[str]] = None, fmt: Optional[str] = None,
+                filters: Optional[List] = None) -> pd.DataFrame:
+    """
+    Load parsed tweets, reading only the requested columns (and partitions for parquet filters) from the first
+    available format unless one is given
+    """
+    if fmt is None:
+        available = [f for f in ['parquet', 'feather', 'csv'] if os.path.exists(parsed_path(save_dir, version, f))]
+        if len(available) == 0:
+            raise FileNotFoundError('No parsed tweets in {}'.format(save_dir))
+        fmt = available[0]
+    path = parsed_path(save_dir, version, fmt)
+    if fmt == 'parquet':
+        df = pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters)
+        if columns is not None:
+            return df
+        # Partition keys come back last, year is only a partition key and p_version goes back among the records
+        df = df.drop(columns=['year'])
+        return df[[c for c in RECORD_COLUMNS if c in df.columns] + [c for c in df.columns if c not in RECORD_COLUMNS]]
+    if fmt == 'feather':
+        return pd.read_feather(path, columns=columns)
+    if fmt == 'csv':
+        dates = [c for c in ['created_at', 'tweet_date'] if columns is None or c in columns]
+        return pd.read_csv(path, usecols=columns, parse_dates=dates)
+    raise ValueError('Cannot load parsed tweets from {}'.format(fmt))
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import functools
+from datetime import datetime
+from typing import NamedTuple, Tuple, List, Dict, Any, Optional, Pattern
+
+
+EMOJIS = re.compile("["
+                    u"\U0001F600-\U0001F64F"  # emoticons
+                    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+                    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+                    u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+                    u"\U00002500-\U00002BEF"  # chinese char
+                    u"\U00002702-\U000027B0"
+                    u"\U00002702-\U000027B0"
+                    u"\U000024C2-\U0001F251"
+                    u"\U0001f926-\U0001f937"
+                    u"\U00010000-\U0010ffff"
+                    u"\u2640-\u2642"
+                    u"\u2600-\u2B55"
+                    u"\u200d"
+                    u"\u23cf"
+                    u"\u23e9"
+                    u"\u231a"
+                    u"\ufe0f"  # dingbats
+                    u"\u3030"
+                    "]+", re.UNICODE)
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+# What a matched line contributes to a parsed tweet
+# stop: an airport code and time, the first stop is the departure, the last the arrival
+STOP = 'stop'
+# pair: departure and arrival codes on one line, only used when there are no stops
+PAIR = 'pair'
+# parts: separated parts, each classified into a field by the part rules
+PARTS = 'parts'
+ROLES = {STOP: 2, PAIR: 2, PARTS: 0}
+
+GROUP = re.compile(r'\(\?P([<=])(\w+)')
+
+
+class Line(NamedTuple):
+    kind: Optional[str]
+    role: Optional[str]
+    fields: Tuple[str, ...]
+
+
+class LineGrammar(object):
+    """
+    A parser version's rule set compiled once: every line pattern into a single alternation with a named group per
+    rule, tried in rule order, and the part rules into a literal lookup plus one alternation per part position
+    """
+    def __init__(self, rules: Dict[str, Any]):
+        self.version = rules['version']
+        self.rules = rules
+        self.line_rules = {}
+        patterns = []
+        for rule in rules['lines']:
+            kind, role = rule['kind'], rule['role']
+            if role not in ROLES:
+                raise ValueError('Unknown role {} for {} lines, expected one of {}'.format(role, kind, list(ROLES)))
+            if len(rule.get('fields', [])) != ROLES[role]:
+                raise ValueError('{} lines need {} fields'.format(kind, ROLES[role]))
+            # Group names are prefixed by the rule kind so every rule can reuse them
+            patterns.append('(?P<{}>{})'.format(kind, GROUP.sub(r'(?P\1{}__\2'.format(kind), rule['pattern'])))
+            groups = tuple('{}__{}'.format(kind, field) for field in rule.get('fields', []))
+            self.line_rules[kind] = (role, groups, rule.get('split'))
+        self.pattern = re.compile('|'.join(patterns)) if len(patterns) > 0 else None
+
+        self.part_rules = rules['parts']
+        self.part_fields = list(dict.fromkeys(rule['field'] for rule in self.part_rules))
+        # First set rule naming each literal, by rule order
+        self.literals = {}
+        for order, rule in enumerate(self.part_rules):
+            if 'in' in rule:
+                for literal in rules['sets'][rule['in']]:
+                    self.literals.setdefault(literal, order)
+            elif re.compile(rule['pattern']).groups > 0:
+                raise ValueError('Part patterns cannot have groups: {}'.format(rule['pattern']))
+
+    @functools.lru_cache(maxsize=None)
+    def part_pattern(self, position: int) -> Optional[Pattern]:
+        """
+        Alternation of the pattern rules that apply at a part position, the group r{order} names the matching rule
+        """
+        patterns = []
+        for order, rule in enumerate(self.part_rules):
+            if 'pattern' not in rule or position not in rule.get('positions', [position]):
+                continue
+            length = ''
+            if 'min_length' in rule or 'max_length' in rule:
+                length = '(?=.{{{},{}}}\\Z)'.format(rule.get('min_length', 0), rule.get('max_length', ''))
+            patterns.append('(?P<r{}>{}(?:{}))'.format(order, length, rule['pattern']))
+        return re.compile('|'.join(patterns)) if len(patterns) > 0 else None
+
+    def part_order(self, position: int, part: str) -> int:
+        """
+        Order of the first part rule matching a stripped part, the number of part rules if none does
+        """
+        order = self.literals.get(part, len(self.part_rules))
+        pattern = self.part_pattern(position)
+        match = pattern.match(part) if pattern is not None else None
+        if match is not None:
+            order = min(order, int(match.lastgroup[1:]))
+        return order
+
+    def classify_part(self, position: int, part: str) -> Optional[str]:
+        """
+        Field of the first part rule matching a stripped part, if any
+        """
+        order = self.part_order(position, part)
+        return self.part_rules[order]['field'] if order < len(self.part_rules) else None
+
+    def classify(self, line: str) -> Line:
+        """
+        Classify an emoji-free stripped line, fields are the stripped parts the matching role needs
+        """
+        match = self.pattern.match(line) if self.pattern is not None else None
+        if match is None:
+            return Line(None, None, ())
+        role, groups, split = self.line_rules[match.lastgroup]
+        if role == PARTS:
+            return Line(match.lastgroup, role, tuple(part.strip() for part in line.split(split)))
+        return Line(match.lastgroup, role, tuple(match.group(group).strip() for group in groups))
+
+    def lines(self, tweet: str) -> List[Line]:
+        return [self.classify(EMOJIS.sub('', tweet_line).strip()) for tweet_line in tweet.split('\n')]
+
+
+def load_rules(version: str, rules_dir: str = RULES_DIR) -> Dict[str, Any]:
+    with open(os.path.join(rules_dir, '{}.json'.format(version)), 'r') as fp:
+        return json.load(fp)
+
+
+@functools.lru_cache(maxsize=None)
+def grammar(version: str, rules_dir: str = RULES_DIR) -> LineGrammar:
+    """
+    Compiled grammar of a parser version from rules/{version}.json, new tweet formats only need a new rule set
+    """
+    return LineGrammar(load_rules(version, rules_dir))
+
+
+@functools.lru_cache(maxsize=None)
+def version_table(rules_dir: str = RULES_DIR) -> Tuple[List[str], List[str]]:
+    """
+    Parsing version cutover table from the effective_after of every rule set, the boundaries and the versions in
+    force up to and including each boundary, then the latest. The earliest rule set has no effective_after
+    """
+    rule_sets = [load_rules(name[:-len('.json')], rules_dir) for name in sorted(os.listdir(rules_dir))
+                 if name.endswith('.json')]
+    earliest = [rules['version'] for rules in rule_sets if rules.get('effective_after') is None]
+    if len(earliest) != 1:
+        raise ValueError('Exactly one rule set in {} needs no effective_after, found {}'.format(rules_dir, earliest))
+    rule_sets = sorted(rule_sets, key=lambda rules: datetime.min if rules.get('effective_after') is None else
+                       datetime.fromisoformat(rules['effective_after']))
+    return [rules['effective_after'] for rules in rule_sets[1:]], [rules['version'] for rules in rule_sets]
+
+
+GRAMMAR = grammar('v1')
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, Optional
+import pandas as pd
+
+from twitter.config import Config
+
+
+# Columns every lookup returns, each index carries all of them so queries never touch the table
+FLIGHT_COLUMNS = ['created_at', 'screen_name', 'tweet_id', 'tail_no', 'aircraft_type', 'routing_no', 'departure',
+                  'arrival', 'team_name']
+# Lookup keys, each index leads with its keys then created_at for date ranges
+INDEX_KEYS = {
+    'tail_no': ['tail_no'],
+    'route': ['departure', 'arrival'],
+    'arrival': ['arrival'],
+    'routing_no': ['routing_no'],
+    'team_name': ['team_name'],
+    'created_at': [],
+}
+CODE_COLUMNS = ['tail_no', 'routing_no', 'departure', 'arrival']
+
+
+class FlightIndex(object):
+    """
+    Parsed flights of every tracked account in one SQLite file with covering indexes on the lookup keys
+    """
+    def __init__(self, path: Optional[str] = None, version: str = Config.version):
+        self.path = os.path.join(Config.DATA_DIR, 'flight_index_{}.sqlite'.format(version)) if path is None else path
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS flights (screen_name TEXT NOT NULL, tweet_id INTEGER NOT NULL, '
+                         'created_at TEXT NOT NULL, tail_no TEXT, aircraft_type TEXT, routing_no TEXT, departure TEXT, '
+                         'arrival TEXT, team_name TEXT, parser_hash TEXT NOT NULL, '
+                         'PRIMARY KEY (screen_name, tweet_id)) WITHOUT ROWID')
+            for name, keys in INDEX_KEYS.items():
+                columns = keys + [c for c in FLIGHT_COLUMNS if c not in keys]
+                conn.execute('CREATE INDEX IF NOT EXISTS flights_by_{} ON flights ({})'.format(
+                    name, ', '.join(columns)))
+
+    def update(self, screen_name: str, df: pd.DataFrame, hashes: Dict[str, str]) -> int:
+        """
+        Upsert the flights of an account's parsed tweets, skipping tweets already indexed by the same parser rules and
+        dropping flights of tweets whose re-parse no longer has one
+        """
+        if df.shape[0] == 0:
+            return 0
+        df = df.assign(
+            screen_name=screen_name,
+            parser_hash=df['p_version'].map(hashes),
+            created_at=pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        )
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            # Only the primary key range of these tweets, chunks of a streamed parse stay cheap to upsert
+            indexed = pd.read_sql_query(
+                'SELECT tweet_id, parser_hash FROM flights WHERE screen_name = ? AND tweet_id BETWEEN ? AND ?', conn,
+                params=[screen_name, int(df['tweet_id'].min()), int(df['tweet_id'].max())])
+            parser_hashes = indexed.set_index('tweet_id')['parser_hash']
+            indexed_hash = df['tweet_id'].map(parser_hashes)
+            stale = df.loc[indexed_hash.notna() & (indexed_hash != df['parser_hash']), 'tweet_id']
+            conn.executemany('DELETE FROM flights WHERE screen_name = ? AND tweet_id = ?',
+                             [(screen_name, tweet_id) for tweet_id in stale.tolist()])
+
+            df = df[(indexed_hash != df['parser_hash']) &
+                    df[['tail_no', 'routing_no', 'departure', 'arrival']].notna().any(axis=1)]
+            columns = FLIGHT_COLUMNS + ['parser_hash']
+            rows = df[columns].astype(object).where(df[columns].notna(), None)
+            conn.executemany('INSERT OR REPLACE INTO flights ({}) VALUES ({})'.format(
+                ', '.join(columns), ', '.join('?' * len(columns))), rows.itertuples(index=False, name=None))
+        return df.shape[0]
+
+    def flights(self, tail_no: Optional[str] = None, departure: Optional[str] = None, arrival: Optional[str] = None,
+                routing_no: Optional[str] = None, team_name: Optional[str] = None, screen_name: Optional[str] = None,
+                start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Flights matching every given key, start inclusive and end exclusive on created_at, newest first
+        """
+        keys = {'tail_no': tail_no, 'departure': departure, 'arrival': arrival, 'routing_no': routing_no,
+                'team_name': team_name, 'screen_name': screen_name}
+        clauses, params = [], []
+        for column, value in keys.items():
+            if value is not None:
+                clauses.append('{} = ?'.format(column))
+                params.append(value.upper() if column in CODE_COLUMNS else value)
+        if start is not None:
+            clauses.append('created_at >= ?')
+            params.append(str(pd.Timestamp(start)))
+        if end is not None:
+            clauses.append('created_at < ?')
+            params.append(str(pd.Timestamp(end)))
+        query = 'SELECT {} FROM flights'.format(', '.join(FLIGHT_COLUMNS))
+        if len(clauses) > 0:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY created_at DESC'
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        with closing(sqlite3.connect(self.path)) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df['created_at'] = pd.to_datetime(df['created_at'])
+        return df
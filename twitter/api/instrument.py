@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import time
+import datetime
+import resource
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterator
+
+
+def reset_peak_rss():
+    """
+    Reset the resident set high water mark so the next reading covers a single stage, linux only
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss() -> float:
+    """
+    Peak resident set size in MB since the last reset, or over the process lifetime where that is not available
+    """
+    try:
+        with open('/proc/self/status', 'r') as fp:
+            return int(re.search(r'VmHWM:\s+(\d+) kB', fp.read()).group(1)) / 1024.
+    except (OSError, AttributeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+class RunReport(object):
+    """
+    Wall time, cpu time, peak memory, item counts and api calls for each pipeline stage of one screen name.
+    cpu time and memory are process wide, so concurrent pulls in a batch overlap
+    """
+    def __init__(self, screen_name: str):
+        self.screen_name = screen_name
+        self.started_at = datetime.datetime.now().isoformat()
+        self.stages = []
+        self.counters = {}
+        self._open = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[Dict[str, Any]]:
+        if not hasattr(self._open, 'stack'):
+            self._open.stack = []
+        return self._open.stack
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        stack = self._stack()
+        record = {'stage': name, 'items': 0, 'counts': {}, 'peak_rss_mb': 0.}
+        if len(stack) > 0:
+            # The outer stage keeps what it reached before the reset
+            stack[-1]['peak_rss_mb'] = max(stack[-1]['peak_rss_mb'], peak_rss())
+        reset_peak_rss()
+        stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            record['peak_rss_mb'] = max(record['peak_rss_mb'], peak_rss())
+            stack.pop()
+            if len(stack) > 0:
+                stack[-1]['peak_rss_mb'] = max(stack[-1]['peak_rss_mb'], record['peak_rss_mb'])
+            with self._lock:
+                self.stages.append(record)
+
+    def count(self, key: str, n: int = 1):
+        """
+        Add to a counter of the run and of the innermost open stage of this thread
+        """
+        stack = self._stack()
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+            if len(stack) > 0:
+                stack[-1]['counts'][key] = stack[-1]['counts'].get(key, 0) + n
+
+    def items(self, n: int):
+        """
+        Add to the items handled by the innermost open stage of this thread
+        """
+        stack = self._stack()
+        if len(stack) > 0:
+            stack[-1]['items'] += n
+
+    def counted(self, key: str, method: Callable) -> Callable:
+        """
+        Wrap an api method to count its calls, and failed calls as {key}_errors
+        """
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            self.count(key)
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                self.count('{}_errors'.format(key))
+                raise
+        return wrapper
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'screen_name': self.screen_name,
+            'started_at': self.started_at,
+            'counters': self.counters,
+            'stages': self.stages,
+        }
+
+    def save(self, path: str):
+        with open(path + '.tmp', 'w') as jp:
+            json.dump(self.to_dict(), jp, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+def instrumented(name: str) -> Callable:
+    """
+    Record a method as a stage of the instance's run report
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.report.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
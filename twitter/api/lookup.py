@@ -0,0 +1,140 @@
+import os
+import re
+import csv
+import string
+import functools
+from typing import Callable, Optional
+import numpy as np
+import pandas as pd
+
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference')
+LETTERS = string.ascii_uppercase
+ALPHANUMERIC = string.ascii_uppercase + string.digits
+# Leading airport code of a parsed field, e.g. 'DFW' of 'DFW (Love Field)'
+AIRPORT_TOKEN = re.compile('([A-Z]{3,4})(?![A-Z])')
+SEPARATORS = re.compile('[-\\s]')
+
+
+def encode(code: str, alphabet: str) -> int:
+    """
+    Position of a code among all codes of up to its length, characters are digits of base len(alphabet) + 1 so
+    shorter codes never collide with longer ones. -1 if a character is not in the alphabet
+    """
+    index = 0
+    for char in code:
+        digit = alphabet.find(char)
+        if digit < 0:
+            return -1
+        index = index * (len(alphabet) + 1) + digit + 1
+    return index
+
+
+class Reference(object):
+    """
+    Bundled airport (IATA / ICAO) and ICAO aircraft type designator reference in flat arrays indexed by the encoded
+    code, so a lookup is one array read however many codes there are
+    """
+    __slots__ = ('iata', 'icao', 'country', 'aircraft_types', '_iata', '_icao', '_aircraft_types')
+
+    def __init__(self, reference_dir: str = REFERENCE_DIR):
+        self.iata, self.icao, self.country = [], [], []
+        with open(os.path.join(reference_dir, 'airports.csv'), 'r', newline='') as fp:
+            for row in csv.DictReader(fp):
+                self.iata.append(row['iata'])
+                self.icao.append(row['icao'])
+                self.country.append(row['country'])
+        with open(os.path.join(reference_dir, 'aircraft_types.csv'), 'r', newline='') as fp:
+            self.aircraft_types = [row['icao'] for row in csv.DictReader(fp)]
+
+        # Row of each airport by its 3 letter IATA and 4 letter ICAO code, -1 where there is none
+        self._iata = np.full((len(LETTERS) + 1) ** 3, -1, dtype='int16')
+        self._icao = np.full((len(LETTERS) + 1) ** 4, -1, dtype='int16')
+        for row, (iata, icao) in enumerate(zip(self.iata, self.icao)):
+            self._iata[encode(iata, LETTERS)] = row
+            if icao != '':
+                self._icao[encode(icao, LETTERS)] = row
+        self._aircraft_types = np.zeros((len(ALPHANUMERIC) + 1) ** 4, dtype=bool)
+        self._aircraft_types[[encode(code, ALPHANUMERIC) for code in self.aircraft_types]] = True
+
+    def airport(self, code: str) -> Optional[str]:
+        """
+        IATA code of an airport from its IATA or ICAO code
+        """
+        if len(code) not in [3, 4]:
+            return None
+        index = encode(code, LETTERS)
+        row = -1 if index < 0 else (self._iata if len(code) == 3 else self._icao)[index]
+        return self.iata[row] if row >= 0 else None
+
+    def aircraft_type(self, code: str) -> Optional[str]:
+        """
+        The code if it is a known ICAO aircraft type designator
+        """
+        if not 2 <= len(code) <= 4:
+            return None
+        index = encode(code, ALPHANUMERIC)
+        return code if index >= 0 and self._aircraft_types[index] else None
+
+
+@functools.lru_cache(maxsize=None)
+def reference() -> Reference:
+    """
+    Reference tables, loaded at first use
+    """
+    return Reference()
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def normalize_airport(code: str) -> Optional[str]:
+    """
+    Validated IATA code of a parsed airport, e.g. 'dfw', 'DFW (Love Field)' and 'KDFW' are all 'DFW'
+    """
+    match = AIRPORT_TOKEN.match(code.strip().upper())
+    return reference().airport(match.group(1)) if match is not None else None
+
+
+def clean_aircraft_type(code: str) -> Optional[str]:
+    """
+    Parsed aircraft type upper cased without separators, e.g. 'b-738' is 'B738'
+    """
+    code = SEPARATORS.sub('', code.upper())
+    return code if code != '' else None
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def normalize_aircraft_type(code: str) -> Optional[str]:
+    """
+    Validated ICAO designator of a parsed aircraft type, e.g. 'b738' and 'B-738' are 'B738'
+    """
+    code = clean_aircraft_type(code)
+    return reference().aircraft_type(code) if code is not None else None
+
+
+# Validated column: parsed column it is normalized from and the normalizer
+VALIDATED_COLUMNS = {
+    'departure_iata': ('departure', normalize_airport),
+    'arrival_iata': ('arrival', normalize_airport),
+    'aircraft_type_icao': ('aircraft_type', normalize_aircraft_type),
+}
+
+
+def normalized(values: pd.Series, normalizer: Callable[[str], Optional[str]]) -> pd.Series:
+    """
+    Normalize a column calling the normalizer once per distinct value, missing values stay missing
+    """
+    values = values.astype(object)
+    mapping = {value: normalizer(value) for value in values.dropna().unique() if isinstance(value, str)}
+    values = values.map(mapping).astype(object)
+    return values.where(values.notna(), None)
+
+
+def validate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the validated code columns that are missing
+    """
+    for column, (source, normalizer) in VALIDATED_COLUMNS.items():
+        if column not in df.columns:
+            df[column] = normalized(df[source], normalizer)
+    return df
+
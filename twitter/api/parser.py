@@ -1,313 +1,228 @@
-import re
-from typing import List, Dict, Any, Tuple, Optional
-from tqdm import tqdm
+import json
+import inspect
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Dict, Any, Optional, List, Tuple
 import pandas as pd
 
 from twitter.config import logger
 from twitter.api.etl import ETL
+from twitter.api import columnar
+from twitter.api.cache import ParseCache
+from twitter.api.index import FlightIndex
+from twitter.api.aggregates import FlightAggregates
+from twitter.api.lookup import validate
+from twitter.api.instrument import instrumented
+from twitter.api.records import StatusColumns, IdSet, version_cutovers
+from twitter.api.columnar import parse_tweets, PARSED_COLUMNS
+from twitter.api.formats import ParsedWriter, STREAM_FORMATS, RECORD_COLUMNS
+from twitter.api.grammar import EMOJIS, STOP, PAIR, PARTS, grammar, version_table
 
 
 class Parser(ETL):
     """
     Parse the data from twitter
     """
-    @staticmethod
-    def _get_user_mentions(tweet: Dict[str, Any]) -> str:
-        mentions = tweet.get('entities', {}).get('user_mentions', [])
-        if len(mentions) > 0:
-            return mentions[0].get('screen_name', 'None')
-        else:
-            return 'None'
-
-    @staticmethod
-    def _get_team_names(tweet: Dict[str, Any]) -> str:
-        mentions = tweet.get('entities', {}).get('user_mentions', [])
-        if len(mentions) > 0:
-            return mentions[0].get('name', 'None')
-        else:
-            return 'None'
-
-    @staticmethod
-    def _get_flightware_links(tweet: Dict[str, Any]) -> str:
-        # Get first link for flightware
-        urls = tweet.get('entities', []).get('urls', [])
-        if len(urls) > 0:
-            return urls[0].get('url', 'None')
-        else:
-            return 'None'
-
-    @staticmethod
-    def _parsing_versions(created_at: pd.Timestamp) -> str:
-        if created_at > pd.Timestamp('2017-01-03 00:00:00'):
-            return 'v1'
-        else:
-            return 'v2'
+    parse_engine = 'columnar'
+    parse_chunk_size = 5000
+    parse_cache = True
+    # Raw statuses parsed and written at a time by stream_parsed
+    stream_chunk_size = 10000
 
     @staticmethod
     def remove_emojis(text: str) -> str:
-        emoj = re.compile("["
-                          u"\U0001F600-\U0001F64F"  # emoticons
-                          u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-                          u"\U0001F680-\U0001F6FF"  # transport & map symbols
-                          u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                          u"\U00002500-\U00002BEF"  # chinese char
-                          u"\U00002702-\U000027B0"
-                          u"\U00002702-\U000027B0"
-                          u"\U000024C2-\U0001F251"
-                          u"\U0001f926-\U0001f937"
-                          u"\U00010000-\U0010ffff"
-                          u"\u2640-\u2642"
-                          u"\u2600-\u2B55"
-                          u"\u200d"
-                          u"\u23cf"
-                          u"\u23e9"
-                          u"\u231a"
-                          u"\ufe0f"  # dingbats
-                          u"\u3030"
-                          "]+", re.UNICODE)
-        return re.sub(emoj, '', text).strip()
+        return EMOJIS.sub('', text).strip()
 
-    @staticmethod
-    def _is_airport_format(version: str, tweet_line: str) -> bool:
-        if version == 'v1':
-            tweet_line_parts = [t.strip() for t in tweet_line.split('-')]
-            # Should have two parts
-            split_by_dash = len(tweet_line_parts) == 2
-            if not split_by_dash:
-                return split_by_dash
-
-            # First part is airport code
-            airport_code = tweet_line_parts[0]
-            is_airport_code = bool(re.match('[A-Z]{3}', airport_code))
-            # Second part is a time
-            is_time = re.match(r'^[0-9]{1,2}:[0-9]{2}\s?[ap]m [A-Z0-9+]{2,3}', tweet_line_parts[1])
-            return is_airport_code and is_time
-        else:
-            return False
-
-    @staticmethod
-    def _airport_format(version: str, ldx: int, tweet_line: str) -> Dict[str, str]:
-        if version == 'v1':
-            tweet_line_parts = [t.strip() for t in tweet_line.split('-')]
-            return {
-                '{}_airport_code'.format(ldx): tweet_line_parts[0],
-                '{}_airport_time'.format(ldx): tweet_line_parts[1]
-            }
-        else:
-            return {}
-
-    @staticmethod
-    def _is_old_airport_format(tweet_line: str) -> bool:
-        tweet_line_parts = [t.strip() for t in tweet_line.split(' ') if t.strip() != '']
-        if len(tweet_line_parts) == 2 and all([re.match('[A-Z]{3}', t.strip()) for t in tweet_line_parts]):
-            return True
-        else:
-            return False
-
-    @staticmethod
-    def _old_airport_format(tweet_line: str) -> Dict[str, str]:
-        tweet_line_parts = [t.strip() for t in tweet_line.split(' ') if t.strip() != '']
-        # import ipdb; ipdb.set_trace()
-        return {
-            'OLD_0_airport_code': tweet_line_parts[0],
-            'OLD_1_airport_code': tweet_line_parts[1]
-        }
-
-    @staticmethod
-    def _is_aircraft_format(version: str, tweet_line: str) -> bool:
-        if version == 'v1':
-            tweet_line_parts = [t.strip() for t in tweet_line.split('|')]
-            # Should have two or 3 parts
-            split_by_pipe = len(tweet_line_parts) in [2, 3]
-            if not split_by_pipe:
-                return split_by_pipe
-
-            # No line part should be more than 7 characters or less than 2
-            for tweet_line_part in tweet_line_parts:
-                if len(tweet_line_part) > 7 or len(tweet_line_part) < 2:
-                    return False
-            return True
+    @classmethod
+    def _parse_tweet(cls, version: str, tweet: str) -> Dict[str, str]:
+        """
+        Parse a tweet with the compiled rule set of its parsing version
+        """
+        rules = grammar(version)
+        stops, pair, result = {}, None, {}
+        for ldx, line in enumerate(rules.lines(tweet)):
+            # Airport code + arrival / layover / departure time, only line numbers 0-9 count
+            if line.role == STOP and ldx < 10:
+                stops[ldx] = line.fields
+
+            # Older airport format
+            elif line.role == PAIR:
+                pair = line.fields
+
+            # Aircraft line for routing_no, aircraft_type, and tail_no, the last one wins outright
+            elif line.role == PARTS:
+                result = dict.fromkeys(rules.part_fields)
+                for idx, part in enumerate(line.fields):
+                    field = rules.classify_part(idx, part)
+                    if field is not None:
+                        result[field] = part
+
+        # Convert the first airport code / time to departure and the last to arrival
+        if len(stops) > 0:
+            first, last = min(stops), max(stops)
+            result['departure'], result['departure_time'] = stops[first]
+            result['arrival'], result['arrival_time'] = stops[last]
+
+            # Add a layover if there are 3 entries for airport-codes / times
+            if last - first == 3 and last - 1 in stops:
+                result['layover'], result['layover_time'] = stops[last - 1]
+        elif pair is not None:
+            result['departure'], result['arrival'] = pair
+        return result
+
+    def _parse_posts(self, df_posts: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parse posts one row at a time with _parse_tweet
+        """
+        from tqdm import tqdm
 
-    @staticmethod
-    def _aircraft_format(version: str, tweet_line: str) -> Dict[str, str]:
-        if version == 'v1':
-            tweet_line_parts = [t.strip() for t in tweet_line.split('|')]
-            tail_no, routing_no, aircraft_type = None, None, None
-            for idx, tweet_line_part in enumerate(tweet_line_parts):
-                # Capture the international tail-nos
-                if tweet_line_part in [
-                    'TF-FIO', 'CGBIK', 'CGJVX', 'F-HNCO', 'CFYKR', 'C-GBIK', 'C-GBHN', 'C-GJWI', 'C-FYKR',
-                    'C-GBIA', 'C-FGJI',
-                ]:
-                    tail_no = tweet_line_part
-                    continue
-                # Capture the canadian ones
-                if idx in [0, 1] and re.match('^C-?[A-Z]{4}', tweet_line_part):
-                    tail_no = tweet_line_part
-                    continue
-                # Capture the mexican ones
-                if idx == 0 and re.match('^XA-[A-Z]{3}', tweet_line_part):
-                    tail_no = tweet_line_part
-                    continue
-                # If it starts with N and has at least one number, and more than 3 characters it is a tail_no
-                # https://en.wikipedia.org/wiki/Aircraft_registration
-                if tweet_line_part.startswith('N') and \
-                        re.match('.*\d.*', tweet_line_part) and \
-                        len(tweet_line_part) > 3:
-                    tail_no = tweet_line_part
-                    continue
-
-                # If it starts with a capital letter, has 2, 3, or 4 characters -> Then it is an aircraft-type
-                # https://en.wikipedia.org/wiki/List_of_aircraft_type_designators
-                elif re.match('^[A-Z]', tweet_line_part) and len(tweet_line_part) in [2, 3, 4]:
-                    aircraft_type = tweet_line_part
-                    continue
-
-                # If it starts with 2 or 3 Capital letters then 1-4 digits then it is a routing number
-                elif re.match('^[A-Z]{2,3}[0-9]{1,4}', tweet_line_part):
-                    routing_no = tweet_line_part
-                    continue
-
-            return {
-                'tail_no': tail_no,
-                'aircraft_type': aircraft_type,
-                'routing_no': routing_no
-            }
-        else:
-            return {}
+        frames = []
+        for p_version, df_ in df_posts.groupby('p_version'):
+            logger.info('Parsing {}'.format(p_version))
+            rows = []
+            for tweet in tqdm(df_['tweet'], total=df_.shape[0]):
+                results = self._parse_tweet(p_version, tweet)
+                rows.append(tuple(results.get(column) for column in PARSED_COLUMNS))
+            frames.append(pd.DataFrame(rows, columns=PARSED_COLUMNS, index=df_.index, dtype=object))
+        return self._concat_fields(frames)
+
+    def _parse_posts_columnar(self, df_posts: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parse posts a whole column at a time, same output as _parse_posts
+        """
+        frames = []
+        for p_version, df_ in df_posts.groupby('p_version'):
+            logger.info('Parsing {} ({} Tweets)'.format(p_version, df_.shape[0]))
+            frames.append(parse_tweets(p_version, df_['tweet']))
+        return self._concat_fields(frames)
 
-    @staticmethod
-    def _is_layover_format(version: str, tweet_line: str) -> bool:
-        if version == 'v1':
-            # If the pipe operate splits it into two and the first part is split into two by a dash then it is a layover
-            if len(tweet_line.split('|')) == 2 and len(tweet_line.split('|')[0].split('-')) == 2:
-                return True
-            else:
-                return False
-        else:
-            return False
+    def _parse_posts_parallel(self, df_posts: pd.DataFrame, engine: str, workers: int) -> pd.DataFrame:
+        """
+        Parse chunks of posts in a process pool, records come back as tuples in the same order as the serial path
+        """
+        frames = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for p_version, df_ in df_posts.groupby('p_version'):
+                logger.info('Parsing {} ({} Tweets) with {} Workers'.format(p_version, df_.shape[0], workers))
+                tweets = df_['tweet'].tolist()
+                chunks = [
+                    (engine, p_version, tweets[idx:idx + self.parse_chunk_size])
+                    for idx in range(0, len(tweets), self.parse_chunk_size)
+                ]
+                rows = [row for chunk in executor.map(_parse_chunk, chunks) for row in chunk]
+                frames.append(pd.DataFrame(rows, columns=PARSED_COLUMNS, index=df_.index, dtype=object))
+        return self._concat_fields(frames)
 
     @staticmethod
-    def _layover_format(version: str, ldx: int, tweet_line: str) -> Dict[str, str]:
-        if version == 'v1':
-            tweet_line_parts = [t.strip() for t in tweet_line.split('|')[0].split('-')]
-            return {
-                '{}_airport_code'.format(ldx): tweet_line_parts[0],
-                '{}_airport_time'.format(ldx): tweet_line_parts[1]
-            }
-        else:
-            return {}
+    def _concat_fields(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        if len(frames) == 0:
+            return pd.DataFrame(columns=PARSED_COLUMNS, dtype=object)
+        return pd.concat(frames)
 
-    def _parse_tweet(self, version: str, tweet: str) -> Dict[str, str]:
+    @classmethod
+    def parser_hash(cls, p_version: str) -> str:
         """
-        Parse a tweet based on observed logic
+        Hash of the parsing rules for a parser version, changes whenever its rule set or the engines applying it do
         """
-        result = {}
-        if version == 'v1':
-            # Strip emojis
-            tweet = '\n'.join([self.remove_emojis(tweet_line) for tweet_line in tweet.split('\n')])
-            # iterate over the lines in the tweet
-            for ldx, tweet_line in enumerate(tweet.split('\n')):
-                # Check for a layover line
-                if self._is_layover_format(version, tweet_line):
-                    result.update(self._layover_format(version, ldx, tweet_line))
-                    continue
-
-                # Airport code + arrival / layover / departure time
-                if self._is_airport_format(version, tweet_line):
-                    result.update(self._airport_format(version, ldx, tweet_line))
-                    continue
-
-                # Older airport format
-                if self._is_old_airport_format(tweet_line):
-                    result.update(self._old_airport_format(tweet_line))
-                    continue
-
-                # Aircraft line for routing_no, aircraft_type, and tail_no
-                if self._is_aircraft_format(version, tweet_line):
-                    result.update(self._aircraft_format(version, tweet_line))
-                    continue
-
-            # Parse intermediate keys for airports / times for ordinal deparatures / layovers / arrivals
-            if len(result) > 0:
-                # Convert the "first" airport code / time to "Departure" and last to "arrival"
-                airport_codes = [int(a[0]) for a in result.keys() if re.match('[0-9]_airport_code', a)]
-                if len(airport_codes) > 0:
-                    min_code, max_code = min(airport_codes), max(airport_codes)
-                    result['departure'] = result[str(min_code) + '_airport_code']
-                    result['departure_time'] = result[str(min_code) + '_airport_time']
-                    result['arrival'] = result[str(max_code) + '_airport_code']
-                    result['arrival_time'] = result[str(max_code) + '_airport_time']
-
-                    # Add a layover if there are 3 entries for airport-codes / times
-                    if max_code - min_code == 3:
-                        result['layover'] = result['{}_airport_code'.format(max_code - 1)]
-                        result['layover_time'] = result['{}_airport_time'.format(max_code - 1)]
-                elif 'OLD_0_airport_code' in result.keys() and 'OLD_1_airport_code' in result.keys():
-                    result['departure'] = result['OLD_0_airport_code']
-                    result['arrival'] = result['OLD_1_airport_code']
-
-                # Drop intermediate keys
-                drops = []
-                for key in result.keys():
-                    if 'airport_code' in key or 'airport_time' in key:
-                        drops.append(key)
-                for drop in drops:
-                    result.pop(drop)
-            return result
-
+        sources = [
+            json.dumps(grammar(p_version).rules, sort_keys=True),
+            inspect.getsource(inspect.getmodule(grammar)),
+            inspect.getsource(columnar),
+            inspect.getsource(cls._parse_tweet),
+        ]
+        return hashlib.sha1('\n'.join([p_version] + sources).encode('utf-8')).hexdigest()
+
+    def _parse_fields(self, df_posts: pd.DataFrame, engine: str, workers: int, use_cache: bool) -> pd.DataFrame:
+        """
+        Parsed fields for every post, only posts that are new or whose parser changed are parsed when caching
+        """
+        cache, df_todo = None, df_posts
+        if use_cache:
+            cache = ParseCache(self.save_dir, self.version)
+            hashes = {p_version: self.parser_hash(p_version) for p_version in df_posts['p_version'].unique()}
+            cache.evict(hashes)
+            cached = cache.get(df_posts['tweet_id'], hashes)
+            hits = df_posts['tweet_id'].isin(cached.index)
+            df_todo = df_posts[~hits]
+            logger.info('{} Parsed Tweets from Cache, {} to Parse'.format(hits.sum(), df_todo.shape[0]))
+
+        if workers > 1:
+            fields = self._parse_posts_parallel(df_todo, engine, workers)
+        elif engine == 'columnar':
+            fields = self._parse_posts_columnar(df_todo)
         else:
-            return {}
-
-    def parse_raw_tweets(self, tweets: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+            fields = self._parse_posts(df_todo)
+
+        if cache is not None:
+            # Engines return fields grouped by version, the cache rows are written in the order of the posts
+            fields = fields.loc[df_todo.index]
+            cache.put(df_todo['tweet_id'], df_todo['p_version'], df_todo['p_version'].map(hashes), fields)
+            cached = cached.loc[df_posts.loc[hits, 'tweet_id']].set_index(df_posts.index[hits])
+            fields = pd.concat([fields, cached]).loc[df_posts.index]
+        return fields
+
+    @instrumented('index')
+    def index_parsed(self, df: pd.DataFrame) -> int:
         """
-        Parse raw tweets from jsons
+        Add newly parsed flights to the flight index shared by every account
         """
-        if tweets is None:
-            tweets = self.etl()
-
-        # Extract data from response object
-        logger.info('Parsing {} Tweets'.format(len(tweets)))
-        df = pd.DataFrame({
-            'created_at': [pd.Timestamp(tweet['created_at']).tz_localize(None) for tweet in tweets],
-            'tweet': [tweet.get('extended_tweet', {'full_text': tweet['text']})['full_text'] for tweet in tweets],
-            'user_mentions': [self._get_user_mentions(tweet) for tweet in tweets],
-            'team_names': [self._get_team_names(tweet) for tweet in tweets],
-            'flightware_links': [self._get_flightware_links(tweet) for tweet in tweets],
-            'retweets': [tweet['retweet_count'] for tweet in tweets],
-            'favorite_count': [tweet['favorite_count'] for tweet in tweets],
-            'is_reply': [tweet['in_reply_to_user_id'] is not None for tweet in tweets],
-            'is_quote_status': [tweet['is_quote_status'] for tweet in tweets],
-        }).drop_duplicates()
+        hashes = {p_version: self.parser_hash(p_version) for p_version in df['p_version'].unique()}
+        num_flights = FlightIndex(version=self.version).update(self.screen_name, df, hashes)
+        logger.info('Indexed {} New Flights for {}'.format(num_flights, self.screen_name))
+        self.report.items(num_flights)
+        return num_flights
+
+    @instrumented('aggregates')
+    def aggregate_parsed(self, df: pd.DataFrame) -> int:
+        """
+        Add newly parsed flight posts to the daily counts shared by every account
+        """
+        hashes = {p_version: self.parser_hash(p_version) for p_version in df['p_version'].unique()}
+        num_tweets = FlightAggregates(version=self.version).update(self.screen_name, df, hashes)
+        logger.info('Counted {} New Tweets for {}'.format(num_tweets, self.screen_name))
+        self.report.items(num_tweets)
+        return num_tweets
 
+    def _posts(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Tag statuses with their date and parsing version and keep only the posts
+        """
         # Define parsing versions
         df['tweet_date'] = df['created_at'].dt.date
-        df['p_version'] = df['created_at'].apply(self._parsing_versions)
+        df['p_version'] = version_cutovers(df['created_at'].to_numpy('datetime64[ns]').view('int64'),
+                                           *version_table())
 
         # Parse data from tweet
         df['is_retweet'] = df['tweet'].apply(lambda t: t.startswith('RT @'))
 
         # Filter for only posts
-        df_posts = df[~df['is_reply'] & ~df['is_quote_status'] & ~df['is_retweet']]
+        return df[~df['is_reply'] & ~df['is_quote_status'] & ~df['is_retweet']]
 
-        # Iterate over versions / tweets
-        records = []
+    @staticmethod
+    def _records(df_posts: pd.DataFrame, fields: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parsed tweets from the posts and their parsed fields
+        """
+        frames = []
         for p_version, df_ in df_posts.groupby('p_version'):
-            logger.info('Parsing {}'.format(p_version))
-            for _, row in tqdm(df_.iterrows(), total=df_.shape[0]):
-                record = {
-                    'created_at': row['created_at'],
-                    'tweet_date': row['tweet_date'],
-                    'tweet': row['tweet'],
-                    'user_mention': row['user_mentions'],
-                    'team_name': row['team_names'],
-                    'flightware_link': row['flightware_links'],
+            frames.append(pd.concat([
+                pd.DataFrame({
+                    'tweet_id': df_['tweet_id'],
+                    'created_at': df_['created_at'],
+                    'tweet_date': df_['tweet_date'],
+                    'tweet': df_['tweet'],
+                    'user_mention': df_['user_mentions'],
+                    'team_name': df_['team_names'],
+                    'flightware_link': df_['flightware_links'],
                     'p_version': p_version
-                }
-                results = self._parse_tweet(p_version, row['tweet'])
-                record.update(results)
-                records.append(record)
-        df = pd.DataFrame.from_records(records).drop_duplicates().reset_index(drop=True)
+                }),
+                fields.loc[df_.index]
+            ], axis=1))
+        if len(frames) == 0:
+            frames = [pd.DataFrame(columns=RECORD_COLUMNS + PARSED_COLUMNS).astype(
+                {'tweet_id': 'int64', 'created_at': 'datetime64[ns]', 'tweet_date': 'datetime64[ns]'})]
+        df = pd.concat(frames).reset_index(drop=True)
 
         # If it is fully parsed it should have a team-name, link, tail_no, aircraft_type, departure, arrival
         df['parsed'] = (df['team_name'] != 'None') & (df['flightware_link'] != 'None') & ~df[[
@@ -323,4 +238,108 @@ class Parser(ETL):
             'departure',
             'arrival',
         ]].isna().any(axis=1)
+
+        # Airports and aircraft types checked against the bundled reference, None where the code is unknown
+        return validate(df)
+
+    def _engine(self, engine: Optional[str]) -> str:
+        engine = self.parse_engine if engine is None else engine
+        if engine not in ['columnar', 'python']:
+            raise ValueError('Unknown parse engine {}'.format(engine))
+        return engine
+
+    @instrumented('parse')
+    def parse_raw_tweets(self, tweets: Optional[Iterable[Dict[str, Any]]] = None, engine: Optional[str] = None,
+                         workers: int = 1, use_cache: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Parse raw tweets from a stream of jsons, engine is 'columnar' (default) or 'python' for the per-row parser.
+        With workers > 1 the posts are parsed in chunks across a process pool, with use_cache only tweets not in the
+        parse cache are parsed
+        """
+        if tweets is None:
+            tweets = self.etl()
+
+        # Extract only the parsed fields from full or compact statuses in one pass, the raw stream is never held
+        with self.report.stage('extract'):
+            columns = StatusColumns()
+            for tweet in tweets:
+                columns.append(tweet)
+            self.report.items(len(columns))
+        logger.info('Parsing {} Tweets'.format(len(columns)))
+        df = columns.to_frame()
+        # Deduped on the int64 tweet id rather than hashing whole rows of tweet text
+        df_posts = self._posts(df[~df['tweet_id'].duplicated()].reset_index(drop=True))
+
+        # Iterate over versions / tweets
+        engine = self._engine(engine)
+        use_cache = self.parse_cache if use_cache is None else use_cache
+        with self.report.stage('parse_fields'):
+            fields = self._parse_fields(df_posts, engine, workers, use_cache)
+            self.report.items(df_posts.shape[0])
+        df = self._records(df_posts, fields)
+        self.report.items(df.shape[0])
         return df
+
+    def _parse_stream(self, tweets: Iterable[Dict[str, Any]], engine: str, workers: int, use_cache: bool,
+                      chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Parsed tweets a chunk of raw statuses at a time, statuses whose id was already seen are dropped
+        """
+        seen, columns = IdSet(), StatusColumns()
+        for tweet in itertools.chain(tweets, [None]):
+            if tweet is not None:
+                columns.append(tweet)
+            if len(columns) == 0 or (tweet is not None and len(columns) < chunk_size):
+                continue
+            self.report.count('statuses', len(columns))
+            df = columns.to_frame()
+            df_posts = self._posts(df[seen.add(df['tweet_id'].to_numpy())].reset_index(drop=True))
+            yield self._records(df_posts, self._parse_fields(df_posts, engine, workers, use_cache))
+            columns = StatusColumns()
+
+    @instrumented('stream')
+    def stream_parsed(self, tweets: Optional[Iterable[Dict[str, Any]]] = None, formats: Optional[List[str]] = None,
+                      engine: Optional[str] = None, workers: int = 1, use_cache: Optional[bool] = None,
+                      index: bool = True, chunk_size: Optional[int] = None, aggregates: bool = True) -> int:
+        """
+        Parse and save raw tweets chunk by chunk (and index and count their flights), so memory is bound by the chunk
+        size rather than the archive. Output rows keep the raw store order instead of being sorted by created_at
+        """
+        if tweets is None:
+            tweets = self.etl()
+        formats = [fmt for fmt in self.output_formats if fmt in STREAM_FORMATS] if formats is None else formats
+        writer = ParsedWriter(self.save_dir, self.version, formats)
+        engine = self._engine(engine)
+        use_cache = self.parse_cache if use_cache is None else use_cache
+        chunk_size = self.stream_chunk_size if chunk_size is None else chunk_size
+
+        num_tweets = 0
+        for df in self._parse_stream(tweets, engine, workers, use_cache, chunk_size):
+            if df.shape[0] == 0:
+                continue
+            writer.write(df)
+            hashes = {p_version: self.parser_hash(p_version) for p_version in df['p_version'].unique()}
+            if index:
+                self.report.count('flights', FlightIndex(version=self.version).update(self.screen_name, df, hashes))
+            if aggregates:
+                self.report.count('counted', FlightAggregates(version=self.version).update(
+                    self.screen_name, df, hashes))
+            num_tweets += df.shape[0]
+            self.report.items(df.shape[0])
+            self.report.count('chunks')
+        if writer.num_chunks == 0:
+            writer.write(self._records(self._posts(StatusColumns().to_frame()), pd.DataFrame(columns=PARSED_COLUMNS)))
+        writer.close()
+        logger.info('Streamed {} Parsed Tweets for {}'.format(num_tweets, self.screen_name))
+        return num_tweets
+
+
+def _parse_chunk(chunk: Tuple[str, str, List[str]]) -> List[Tuple]:
+    """
+    Parse one chunk of tweets in a worker process, one tuple of PARSED_COLUMNS per tweet
+    """
+    engine, p_version, tweets = chunk
+    if engine == 'columnar':
+        return list(parse_tweets(p_version, pd.Series(tweets, dtype=object)).itertuples(index=False, name=None))
+    results = [Parser._parse_tweet(p_version, tweet) for tweet in tweets]
+    return [tuple(result.get(column) for column in PARSED_COLUMNS) for result in results]
@@ -0,0 +1,88 @@
+import time
+import functools
+import threading
+from typing import Callable, Optional
+
+from twitter.config import logger
+
+
+def rate_limit_errors() -> tuple:
+    """
+    Rate limit responses across tweepy versions, tweepy is only imported once a pull needs it
+    """
+    import tweepy
+
+    return tuple(getattr(tweepy, name) for name in ['RateLimitError', 'TooManyRequests'] if hasattr(tweepy, name))
+
+
+class TweetCapReached(Exception):
+    pass
+
+
+class RateLimiter(object):
+    """
+    Token bucket for premium search requests plus a running tweet cap, safe to share across worker threads
+    """
+    def __init__(self, requests_per_minute: float = 60., burst: int = 10, tweet_cap: Optional[int] = None):
+        self.rate = requests_per_minute / 60.
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.tweet_cap = tweet_cap
+        self.num_requests = 0
+        self.num_tweets = 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request token is available
+        """
+        while True:
+            with self.lock:
+                if self.tweet_cap is not None and self.num_tweets >= self.tweet_cap:
+                    raise TweetCapReached('Tweet cap of {} reached'.format(self.tweet_cap))
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.num_requests += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def consume(self, num_tweets: int):
+        with self.lock:
+            self.num_tweets += num_tweets
+
+    def wrap(self, method: Callable) -> Callable:
+        """
+        Rate limit an api method and count the tweets it returns, keeping the pagination mode tweepy.Cursor looks for
+        """
+        @functools.wraps(method)
+        def limited(*args, **kwargs):
+            self.acquire()
+            result = method(*args, **kwargs)
+            self.consume(len(result[0] if isinstance(result, tuple) else result))
+            return result
+        return limited
+
+
+def backoff(method: Callable, retries: int = 5, wait: float = 60., on_retry: Optional[Callable] = None) -> Callable:
+    """
+    Retry an api method on rate limit responses, doubling the wait each time, keeping the pagination mode
+    """
+    @functools.wraps(method)
+    def retried(*args, **kwargs):
+        for attempt in range(retries + 1):
+            try:
+                return method(*args, **kwargs)
+            except Exception as error:
+                if not isinstance(error, rate_limit_errors()) or attempt == retries:
+                    raise
+                delay = wait * 2 ** attempt
+                logger.info('Rate limited, retrying in {:.0f}s ({}/{})'.format(delay, attempt + 1, retries))
+                if on_retry is not None:
+                    on_retry()
+                time.sleep(delay)
+    return retried
@@ -0,0 +1,147 @@
+import array
+from typing import Dict, Any, Sequence
+import numpy as np
+import pandas as pd
+
+
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+
+def created_at_epochs(created_at: Sequence[str]) -> np.ndarray:
+    """
+    Naive UTC nanosecond epochs for a batch of created_at strings, parsed in one vectorized call
+    """
+    if len(created_at) == 0:
+        return np.array([], dtype='int64')
+    timestamps = pd.to_datetime(pd.Series(created_at, dtype=object), format=CREATED_AT_FORMAT, utc=True)
+    return timestamps.dt.tz_localize(None).to_numpy('datetime64[ns]').view('int64')
+
+
+def version_cutovers(epochs: np.ndarray, boundaries: Sequence[str], versions: Sequence[str]) -> np.ndarray:
+    """
+    Version of each epoch, versions[i] covers everything after boundaries[i - 1] up to and including boundaries[i]
+    """
+    bounds = pd.to_datetime(list(boundaries)).to_numpy('datetime64[ns]').view('int64')
+    return np.asarray(versions, dtype=object)[np.searchsorted(bounds, epochs, side='left')]
+
+
+def compact(tweet: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Only the fields of a status the parser uses, already compact statuses pass through
+    """
+    if 'user_mention' in tweet:
+        return tweet
+    entities = tweet.get('entities', {})
+    mentions, urls = entities.get('user_mentions', []), entities.get('urls', [])
+    return {
+        'id': tweet['id'],
+        'created_at': tweet['created_at'],
+        'text': tweet.get('extended_tweet', {'full_text': tweet['text']})['full_text'],
+        'user_mention': mentions[0].get('screen_name', 'None') if len(mentions) > 0 else 'None',
+        'team_name': mentions[0].get('name', 'None') if len(mentions) > 0 else 'None',
+        # Get first link for flightware
+        'flightware_link': urls[0].get('url', 'None') if len(urls) > 0 else 'None',
+        'retweet_count': tweet['retweet_count'],
+        'favorite_count': tweet['favorite_count'],
+        'is_reply': tweet['in_reply_to_user_id'] is not None,
+        'is_quote_status': tweet['is_quote_status'],
+    }
+
+
+class StatusColumns(object):
+    """
+    Array-backed columns of the parsed fields, filled in a single pass over full or compact statuses
+    """
+    # created_at strings are parsed into epochs a batch at a time
+    batch_size = 10000
+    __slots__ = ('tweet_id', 'created_at', '_created_at', 'tweet', 'user_mentions', 'team_names', 'flightware_links',
+                 'retweets', 'favorite_count', 'is_reply', 'is_quote_status')
+
+    def __init__(self):
+        self.tweet_id = array.array('q')
+        self.created_at = array.array('q')
+        self._created_at = []
+        self.tweet = []
+        self.user_mentions = []
+        self.team_names = []
+        self.flightware_links = []
+        self.retweets = array.array('q')
+        self.favorite_count = array.array('q')
+        self.is_reply = array.array('b')
+        self.is_quote_status = array.array('b')
+
+    def __len__(self) -> int:
+        return len(self.tweet_id)
+
+    def append(self, tweet: Dict[str, Any]):
+        record = compact(tweet)
+        self.tweet_id.append(record['id'])
+        self._created_at.append(record['created_at'])
+        self.tweet.append(record['text'])
+        self.user_mentions.append(record['user_mention'])
+        self.team_names.append(record['team_name'])
+        self.flightware_links.append(record['flightware_link'])
+        self.retweets.append(record['retweet_count'])
+        self.favorite_count.append(record['favorite_count'])
+        self.is_reply.append(record['is_reply'])
+        self.is_quote_status.append(record['is_quote_status'])
+        if len(self._created_at) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        self.created_at.frombytes(created_at_epochs(self._created_at).tobytes())
+        self._created_at = []
+
+    def to_frame(self) -> pd.DataFrame:
+        self._flush()
+        return pd.DataFrame({
+            'tweet_id': np.frombuffer(self.tweet_id, dtype='int64'),
+            'created_at': pd.Series(np.frombuffer(self.created_at, dtype='int64')).astype('datetime64[ns]'),
+            'tweet': self.tweet,
+            'user_mentions': self.user_mentions,
+            'team_names': self.team_names,
+            'flightware_links': self.flightware_links,
+            'retweets': np.frombuffer(self.retweets, dtype='int64'),
+            'favorite_count': np.frombuffer(self.favorite_count, dtype='int64'),
+            'is_reply': np.frombuffer(self.is_reply, dtype='int8').astype(bool),
+            'is_quote_status': np.frombuffer(self.is_quote_status, dtype='int8').astype(bool),
+        })
+
+
+class IdSet(object):
+    """
+    Sorted int64 array of tweet ids, 8 bytes an id where a set of ints takes around 70
+    """
+    __slots__ = ('ids',)
+
+    def __init__(self, ids: Sequence[int] = ()):
+        self.ids = np.unique(np.asarray(ids, dtype='int64'))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, tweet_id: int) -> bool:
+        idx = np.searchsorted(self.ids, tweet_id)
+        return bool(idx < len(self.ids) and self.ids[idx] == tweet_id)
+
+    def missing(self, tweet_ids: Sequence[int]) -> np.ndarray:
+        """
+        Mask of the ids of a batch not in the set, duplicates in the batch count once
+        """
+        tweet_ids = np.asarray(tweet_ids, dtype='int64')
+        new = np.zeros(len(tweet_ids), dtype=bool)
+        new[np.unique(tweet_ids, return_index=True)[1]] = True
+        if len(self.ids) > 0:
+            idx = np.searchsorted(self.ids, tweet_ids)
+            new &= self.ids[np.minimum(idx, len(self.ids) - 1)] != tweet_ids
+        return new
+
+    def add(self, tweet_ids: Sequence[int]) -> np.ndarray:
+        """
+        Add a batch of ids, returns a mask of the ones not seen before, duplicates in the batch count once
+        """
+        new = self.missing(tweet_ids)
+        added = np.sort(np.asarray(tweet_ids, dtype='int64')[new])
+        # Inserting the sorted batch is one copy of the array, no re-sort
+        self.ids = np.insert(self.ids, np.searchsorted(self.ids, added), added)
+        return new
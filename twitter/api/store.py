@@ -0,0 +1,264 @@
+import os
+import gzip
+import json
+import datetime
+from typing import Dict, Iterator, List, Any, Optional
+import numpy as np
+
+
+from twitter.config import logger
+from twitter.api.records import CREATED_AT_FORMAT, IdSet
+
+
+class RawStore(object):
+    """
+    Append-only, line-delimited store of raw statuses, optionally chunked and gzipped
+    """
+    def __init__(self, save_dir: str, version: str, compress: bool = False, chunk_bytes: int = 64 * 1024 ** 2):
+        self.save_dir = save_dir
+        self.version = version
+        self.compress = compress
+        self.chunk_bytes = chunk_bytes
+        self.root = os.path.join(save_dir, 'raw_tweets_{}'.format(version))
+        self.legacy_path = os.path.join(save_dir, 'raw_tweets_{}.json'.format(version))
+        self.manifest_path = os.path.join(save_dir, 'manifest_{}.json'.format(version))
+        # Id of every stored line as little-endian int64, appended with each page
+        self.ids_path = os.path.join(save_dir, 'raw_ids_{}.bin'.format(version))
+        self._manifest = None
+        self._ids = None
+
+    @staticmethod
+    def _open(path: str, mode: str):
+        if path.endswith('.gz'):
+            return gzip.open(path, mode + 't', encoding='utf-8')
+        return open(path, mode, encoding='utf-8')
+
+    def parts(self) -> List[str]:
+        if not os.path.exists(self.root):
+            return []
+        return [
+            os.path.join(self.root, f) for f in sorted(os.listdir(self.root))
+            if f.startswith('part-') and (f.endswith('.jsonl') or f.endswith('.jsonl.gz'))
+        ]
+
+    def exists(self) -> bool:
+        return len(self.parts()) > 0
+
+    def _size(self) -> int:
+        return sum(os.path.getsize(part) for part in self.parts())
+
+    def _current_part(self) -> str:
+        """
+        Last part if it still has room and matches the compression setting, else a fresh one
+        """
+        ext = '.jsonl.gz' if self.compress else '.jsonl'
+        parts = self.parts()
+        if len(parts) > 0 and parts[-1].endswith(ext) and os.path.getsize(parts[-1]) < self.chunk_bytes:
+            return parts[-1]
+        return os.path.join(self.root, 'part-{:05d}{}'.format(len(parts), ext))
+
+    @staticmethod
+    def _created_at(tweet: Dict[str, Any]) -> str:
+        return datetime.datetime.strptime(tweet['created_at'], CREATED_AT_FORMAT).replace(tzinfo=None).isoformat()
+
+    def _update_manifest(self, manifest: Dict[str, Any], tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(tweets) > 0:
+            # Only the newest and oldest status of the batch need their timestamp parsed
+            newest, oldest = max(tweets, key=lambda t: t['id']), min(tweets, key=lambda t: t['id'])
+            if manifest['newest_id'] is None or newest['id'] > manifest['newest_id']:
+                manifest['newest_id'], manifest['newest_created_at'] = newest['id'], self._created_at(newest)
+            if manifest['oldest_id'] is None or oldest['id'] < manifest['oldest_id']:
+                manifest['oldest_id'], manifest['oldest_created_at'] = oldest['id'], self._created_at(oldest)
+        manifest['count'] += len(tweets)
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        if not os.path.exists(self.save_dir):
+            os.makedirs(self.save_dir)
+        with open(self.manifest_path + '.tmp', 'w') as jp:
+            json.dump(manifest, jp)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+        self._manifest = manifest
+
+    def manifest(self) -> Dict[str, Any]:
+        """
+        Newest / oldest tweet id and timestamp already stored, rebuilt with one scan if missing
+        """
+        if self._manifest is not None:
+            return self._manifest
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as jp:
+                self._manifest = json.load(jp)
+            return self._manifest
+        manifest = {'count': 0, 'newest_id': None, 'newest_created_at': None, 'oldest_id': None,
+                    'oldest_created_at': None}
+        batch = []
+        for tweet in self.read():
+            batch.append(tweet)
+            if len(batch) == 500:
+                manifest, batch = self._update_manifest(manifest, batch), []
+        manifest = self._update_manifest(manifest, batch)
+        manifest['bytes'] = self._size()
+        self._write_manifest(manifest)
+        return self._manifest
+
+    def newest(self) -> Optional[datetime.datetime]:
+        created_at = self.manifest()['newest_created_at']
+        return None if created_at is None else datetime.datetime.strptime(created_at, '%Y-%m-%dT%H:%M:%S')
+
+    def oldest(self) -> Optional[datetime.datetime]:
+        created_at = self.manifest()['oldest_created_at']
+        return None if created_at is None else datetime.datetime.strptime(created_at, '%Y-%m-%dT%H:%M:%S')
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        """
+        Cursor position of an unfinished pull, saved with the page that reached it
+        """
+        return self.manifest().get('checkpoint')
+
+    def set_checkpoint(self, checkpoint: Optional[Dict[str, Any]]):
+        manifest = dict(self.manifest())
+        manifest['checkpoint'] = checkpoint
+        self._write_manifest(manifest)
+
+    def _truncate(self) -> bool:
+        """
+        Drop a status left half written at the end of the last part by a killed pull
+        """
+        parts = self.parts()
+        if len(parts) == 0:
+            return False
+        part = parts[-1]
+        if part.endswith('.gz'):
+            lines, truncated = [], False
+            with self._open(part, 'r') as fp:
+                try:
+                    for line in fp:
+                        lines.append(line)
+                except EOFError:
+                    truncated = True
+            if len(lines) > 0 and not lines[-1].endswith('\n'):
+                lines, truncated = lines[:-1], True
+            if not truncated:
+                return False
+            with self._open(part + '.tmp.gz', 'w') as fp:
+                fp.write(''.join(lines))
+            os.replace(part + '.tmp.gz', part)
+        else:
+            with open(part, 'rb+') as fp:
+                fp.seek(0, os.SEEK_END)
+                if fp.tell() == 0:
+                    return False
+                fp.seek(-1, os.SEEK_END)
+                if fp.read(1) == b'\n':
+                    return False
+                fp.seek(0)
+                fp.truncate(fp.read().rfind(b'\n') + 1)
+        logger.info('Dropped a truncated status from {}'.format(part))
+        return True
+
+    def repair(self) -> bool:
+        """
+        Drop a half written status, and recount the manifest and id log if a killed pull left them behind the parts
+        """
+        if not self.exists():
+            return False
+        truncated = self._truncate()
+        if not truncated and self.manifest().get('bytes', self._size()) == self._size():
+            return False
+        logger.info('Rebuilding {} and {}'.format(self.manifest_path, self.ids_path))
+        checkpoint = self.checkpoint()
+        for path in [self.manifest_path, self.ids_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        self._manifest, self._ids = None, None
+        self.set_checkpoint(checkpoint)
+        return True
+
+    def ids(self) -> IdSet:
+        """
+        Ids of every stored status from the id log, rebuilt with one scan if it does not cover the whole store
+        """
+        if self._ids is not None:
+            return self._ids
+        count = self.manifest()['count']
+        if os.path.exists(self.ids_path) and os.path.getsize(self.ids_path) == 8 * count:
+            ids = np.fromfile(self.ids_path, dtype='<i8')
+        else:
+            ids = np.fromiter((tweet['id'] for tweet in self.read()), dtype='<i8')
+            if os.path.exists(self.save_dir):
+                with open(self.ids_path + '.tmp', 'wb') as fp:
+                    ids.tofile(fp)
+                os.replace(self.ids_path + '.tmp', self.ids_path)
+        self._ids = IdSet(ids)
+        return self._ids
+
+    def unseen(self, tweets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Statuses not in the store yet, the first of any repeated in the batch
+        """
+        if len(tweets) == 0:
+            return []
+        new = self.ids().missing([tweet['id'] for tweet in tweets])
+        return [tweet for tweet, is_new in zip(tweets, new) if is_new]
+
+    def append(self, tweets: List[Dict[str, Any]], checkpoint: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Append the statuses of a page not already stored, one json document per line. The manifest (and the cursor
+        checkpoint if given) is only replaced once the page and its ids are on disk
+        """
+        manifest = dict(self.manifest())
+        if checkpoint is not None:
+            manifest['checkpoint'] = checkpoint
+        tweets = self.unseen(tweets)
+        if len(tweets) == 0:
+            if checkpoint is not None:
+                self._write_manifest(manifest)
+            return 0
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+        with self._open(self._current_part(), 'a') as fp:
+            fp.write(''.join(json.dumps(tweet) + '\n' for tweet in tweets))
+        ids = np.array([tweet['id'] for tweet in tweets], dtype='<i8')
+        with open(self.ids_path, 'ab') as fp:
+            ids.tofile(fp)
+        self.ids().add(ids)
+        manifest = self._update_manifest(manifest, tweets)
+        manifest['bytes'] = self._size()
+        self._write_manifest(manifest)
+        return len(tweets)
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream statuses back one at a time
+        """
+        for part in self.parts():
+            with self._open(part, 'r') as fp:
+                try:
+                    for line in fp:
+                        if line.strip() == '':
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            # Only a half written last line is skipped, anything else is corrupt
+                            if line.endswith('\n'):
+                                raise
+                            logger.info('Skipping truncated status at the end of {}'.format(part))
+                except EOFError:
+                    logger.info('Skipping truncated end of {}'.format(part))
+
+    def migrate(self) -> int:
+        """
+        One-shot conversion of a monolithic raw_tweets_{version}.json cache into the line-delimited store
+        """
+        if not os.path.exists(self.legacy_path) or self.exists():
+            return 0
+        logger.info('Migrating {} to {}'.format(self.legacy_path, self.root))
+        with open(self.legacy_path, 'r') as jp:
+            tweets = json.load(jp)
+        num_tweets = 0
+        for idx in range(0, len(tweets), 500):
+            num_tweets += self.append(tweets[idx:idx + 500])
+        logger.info('Migrated {} Tweets'.format(num_tweets))
+        return num_tweets
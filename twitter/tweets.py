@@ -1,17 +1,255 @@
+import os
+import cProfile
 import argparse
+from typing import Dict, List, Optional
+import pandas as pd
 
+from twitter.config import Config, logger
 from twitter.api import TwitterPull
+from twitter.api.batch import BatchPull, read_screen_names
+from twitter.api.ratelimit import RateLimiter
+from twitter.api.formats import FORMATS
+from twitter.api.diagnostics import TABLE_FORMATS
+from twitter.api.index import FlightIndex
+from twitter.api.aggregates import FlightAggregates, DIMENSIONS, FLAG_COLUMNS, GRAINS
+
+
+COMMANDS = ['pull', 'parse', 'save', 'diagnose']
+
+
+def _screen_names(args: argparse.Namespace) -> List[str]:
+    if args.screen_name is not None:
+        return [args.screen_name]
+    screen_names = args.screen_names or []
+    if args.screen_names_file is not None:
+        screen_names += read_screen_names(args.screen_names_file)
+    return screen_names
+
+
+def _pull(args: argparse.Namespace) -> Dict[str, TwitterPull]:
+    """
+    Pull a single account, or accounts concurrently under one rate-limit budget
+    """
+    rate_limiter = RateLimiter(requests_per_minute=args.requests_per_minute, tweet_cap=args.tweet_cap)
+    if args.screen_name is not None:
+        api = TwitterPull(screen_name=args.screen_name, rate_limiter=rate_limiter)
+        api.etl(to_date=args.to_date, overwrite=args.overwrite, incremental=args.incremental, backfill=args.backfill,
+                shards=args.shards)
+        return {args.screen_name: api}
+    batch = BatchPull(
+        _screen_names(args),
+        workers=args.pull_workers,
+        rate_limiter=rate_limiter,
+        puller=TwitterPull
+    )
+    return batch.run(to_date=args.to_date, overwrite=args.overwrite, incremental=args.incremental,
+                     backfill=args.backfill, shards=args.shards, resume=args.resume)
+
+
+def _parse(api: TwitterPull, args: argparse.Namespace) -> pd.DataFrame:
+    df = api.parse_raw_tweets(api.raw_tweets(), engine=args.parse_engine, workers=args.parse_workers,
+                              use_cache=not args.no_parse_cache)
+    if not args.no_index:
+        api.index_parsed(df)
+    if not args.no_aggregates:
+        api.aggregate_parsed(df)
+    return df
+
+
+def _stream(api: TwitterPull, args: argparse.Namespace, formats: Optional[List[str]] = None):
+    api.stream_parsed(api.raw_tweets(), formats=formats, engine=args.parse_engine, workers=args.parse_workers,
+                      use_cache=not args.no_parse_cache, index=not args.no_index, aggregates=not args.no_aggregates)
+
+
+def _diagnose(api: TwitterPull, args: argparse.Namespace, df: Optional[pd.DataFrame] = None):
+    api.diagnostics(df, workers=args.diagnostic_workers, plot=not args.no_plots, table_formats=args.diagnostic_tables,
+                    from_aggregates=args.from_aggregates)
+
+
+def _run_all(args: argparse.Namespace):
+    """
+    Pull, parse, save and diagnose each account
+    """
+    pullers = _pull(args)
+    for screen_name in _screen_names(args):
+        if screen_name not in pullers:
+            continue
+        api = pullers[screen_name]
+        if args.stream:
+            _stream(api, args, args.formats)
+            _diagnose(api, args)
+        else:
+            df = _parse(api, args)
+            api.save_parsed(df, formats=args.formats)
+            _diagnose(api, args, df)
+        api.save_report()
+
+
+def _run_command(args: argparse.Namespace):
+    """
+    Run one stage for each account, picking up what the previous stage left on disk. parse keeps the parsed tweets
+    as parquet, which save converts to the other formats and diagnose reads back
+    """
+    if args.command == 'pull':
+        for api in _pull(args).values():
+            api.save_report(args.command)
+        return
+    for screen_name in _screen_names(args):
+        api = TwitterPull(screen_name=screen_name)
+        if args.command == 'parse' and args.stream:
+            _stream(api, args, ['parquet'])
+        elif args.command == 'parse':
+            api.save_parsed(_parse(api, args), formats=['parquet'])
+        elif args.command == 'save':
+            formats = args.formats or [fmt for fmt in api.output_formats if fmt != 'parquet']
+            api.save_parsed(api.load_parsed(fmt='parquet'), formats=formats)
+        else:
+            _diagnose(api, args)
+        api.save_report(args.command)
+
+
+def _arguments() -> Dict[str, argparse.ArgumentParser]:
+    """
+    Flags of each stage, shared between the stage's subcommand and the all-in-one run
+    """
+    targets = argparse.ArgumentParser(add_help=False)
+    targets.add_argument('--screen_name', type=str, required=False, default=None)
+    targets.add_argument('--screen_names', type=str, nargs='+', required=False, default=None)
+    targets.add_argument('--screen_names_file', type=str, required=False, default=None)
+    targets.add_argument('--profile', action='store_true')
+
+    pull = argparse.ArgumentParser(add_help=False)
+    pull.add_argument('--pull_workers', type=int, required=False, default=4)
+    pull.add_argument('--requests_per_minute', type=float, required=False, default=60.)
+    pull.add_argument('--tweet_cap', type=int, required=False, default=None)
+    pull.add_argument('--resume', action='store_true')
+    pull.add_argument('--to_date', type=str, required=False, default=None)
+    pull.add_argument('--overwrite', action='store_true')
+    pull.add_argument('--incremental', action='store_true')
+    pull.add_argument('--backfill', action='store_true')
+    pull.add_argument('--shards', type=int, required=False, default=1)
+
+    parse = argparse.ArgumentParser(add_help=False)
+    parse.add_argument('--parse_engine', type=str, required=False, default='columnar', choices=['columnar', 'python'])
+    parse.add_argument('--parse_workers', type=int, required=False, default=1)
+    parse.add_argument('--no_parse_cache', action='store_true')
+    parse.add_argument('--no_index', action='store_true')
+    parse.add_argument('--no_aggregates', action='store_true')
+    parse.add_argument('--stream', action='store_true')
+
+    save = argparse.ArgumentParser(add_help=False)
+    save.add_argument('--formats', type=str, nargs='+', required=False, default=None, choices=FORMATS)
+
+    diagnose = argparse.ArgumentParser(add_help=False)
+    diagnose.add_argument('--diagnostic_workers', type=int, required=False, default=1)
+    diagnose.add_argument('--diagnostic_tables', type=str, nargs='+', required=False, default=None,
+                          choices=TABLE_FORMATS)
+    diagnose.add_argument('--no_plots', action='store_true')
+    diagnose.add_argument('--from_aggregates', action='store_true')
+    return {'targets': targets, 'pull': pull, 'parse': parse, 'save': save, 'diagnose': diagnose}
+
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    Every stage's flags before a subcommand, and the subcommand's own after it
+    """
+    parser = argparse.ArgumentParser(parents=list(_arguments().values()))
+    commands = parser.add_subparsers(dest='command')
+    arguments = _arguments()
+    for command in COMMANDS:
+        # Subcommand flags only set what is given, so flags before the subcommand are not reset to their defaults
+        for action in arguments['targets']._actions + arguments[command]._actions:
+            action.default = argparse.SUPPRESS
+        commands.add_parser(command, parents=[arguments['targets'], arguments[command]])
+    return parser
 
 
 def twitter_pull():
+    """
+    tw_pull runs every stage, tw_pull <command> only one of them
+    """
+    parser = _parser()
+    args = parser.parse_args()
+
+    if args.screen_names is None and args.screen_names_file is None and args.screen_name is None:
+        parser.error('one of --screen_name, --screen_names or --screen_names_file is required')
+    batch = args.screen_names is not None or args.screen_names_file is not None
+    run = _run_all if args.command is None else _run_command
+    if not args.profile:
+        run(args)
+        return
+
+    # Profiles the main thread, concurrent pulls in a batch are only seen as waits
+    name = 'profile_{}.prof'.format(Config.version) if args.command is None else \
+        'profile_{}_{}.prof'.format(args.command, Config.version)
+    profile = cProfile.Profile()
+    try:
+        profile.runcall(run, args)
+    finally:
+        path = os.path.join(Config.DATA_DIR, name.replace('profile_', 'profile_batch_', 1)) if batch else \
+            os.path.join(Config.DATA_DIR, args.screen_name, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        logger.info('Saving Profile to {}'.format(path))
+        profile.dump_stats(path)
+
+
+def twitter_query():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tail_no', type=str, required=False, default=None)
+    parser.add_argument('--departure', type=str, required=False, default=None)
+    parser.add_argument('--arrival', type=str, required=False, default=None)
+    parser.add_argument('--routing_no', type=str, required=False, default=None)
+    parser.add_argument('--team_name', type=str, required=False, default=None)
+    parser.add_argument('--screen_name', type=str, required=False, default=None)
+    parser.add_argument('--start', type=str, required=False, default=None)
+    parser.add_argument('--end', type=str, required=False, default=None)
+    parser.add_argument('--year', type=int, required=False, default=None)
+    parser.add_argument('--limit', type=int, required=False, default=None)
+    parser.add_argument('--format', type=str, required=False, default='csv', choices=['csv', 'json'])
+    args = parser.parse_args()
+
+    start, end = args.start, args.end
+    if args.year is not None:
+        start, end = '{}-01-01'.format(args.year), '{}-01-01'.format(args.year + 1)
+    df = FlightIndex().flights(tail_no=args.tail_no, departure=args.departure, arrival=args.arrival,
+                               routing_no=args.routing_no, team_name=args.team_name, screen_name=args.screen_name,
+                               start=start, end=end, limit=args.limit)
+    if args.format == 'csv':
+        print(df.to_csv(index=False), end='')
+    else:
+        print(df.to_json(orient='records', date_format='iso'))
+
+
+def twitter_aggregate():
+    """
+    Roll the daily counts of every account up to a time grain by any of the dimensions, e.g. route frequencies by
+    month: tw_agg --dimensions departure_iata arrival_iata --grain month
+    """
     parser = argparse.ArgumentParser()
-    parser.add_argument('--screen_name', type=str, required=True)
-    parser.add_argument('--to_date', type=str, required=False, default=None)
-    parser.add_argument('--overwrite', action='store_true')
+    parser.add_argument('--dimensions', type=str, nargs='+', required=False, default=[],
+                        choices=['screen_name'] + DIMENSIONS)
+    parser.add_argument('--grain', type=str, required=False, default='year', choices=list(GRAINS))
+    parser.add_argument('--screen_names', type=str, nargs='+', required=False, default=None)
+    for dimension in DIMENSIONS:
+        parser.add_argument('--{}'.format(dimension), type=str, required=False, default=None)
+    parser.add_argument('--start', type=str, required=False, default=None)
+    parser.add_argument('--end', type=str, required=False, default=None)
+    parser.add_argument('--year', type=int, required=False, default=None)
+    parser.add_argument('--limit', type=int, required=False, default=None)
+    parser.add_argument('--format', type=str, required=False, default='csv', choices=['csv', 'json'])
     args = parser.parse_args()
 
-    api = TwitterPull(screen_name=args.screen_name)
-    tweets = api.etl(to_date=args.to_date, overwrite=args.overwrite)
-    df = api.parse_raw_tweets(tweets)
-    api.save_parsed(df)
-    api.diagnostics(df)
+    start, end = args.start, args.end
+    if args.year is not None:
+        start, end = '{}-01-01'.format(args.year), '{}-01-01'.format(args.year + 1)
+    filters = {
+        dimension: getattr(args, dimension) in ['1', 'true', 'True'] if dimension in FLAG_COLUMNS
+        else getattr(args, dimension) for dimension in DIMENSIONS if getattr(args, dimension) is not None
+    }
+    df = FlightAggregates().rollup(args.dimensions, grain=args.grain, screen_names=args.screen_names, start=start,
+                                   end=end, filters=filters, limit=args.limit)
+    if args.format == 'csv':
+        print(df.to_csv(index=False), end='')
+    else:
+        print(df.to_json(orient='records', date_format='iso'))